@@ -1,7 +1,6 @@
 import pygame
 import sys
 import random
-import time
 import csv
 import os
 
@@ -14,6 +13,19 @@ main_dir = os.getcwd()
 this_dir = os.path.dirname(__file__)
 # Path to the CSV file with words 
 project_root = os.path.dirname(this_dir)  # Go up one level from Free Recall
+sys.path.insert(0, project_root)  # make experiment_runtime importable
+from experiment_runtime.keystrokes import KeystrokeRecorder
+from experiment_runtime.frame_timing import make_frame_timer
+from experiment_runtime.journal import TrialJournal
+from experiment_runtime.profiling import make_profiler
+from experiment_runtime.renderer import display_for, make_screen
+from experiment_runtime.shards import append_trial
+from experiment_runtime.startup import init_pygame
+from experiment_runtime.stimuli import StimulusAtlas
+from experiment_runtime.text_input import TextLine
+from experiment_runtime.writer import ResultWriter
+profiler = make_profiler()
+result_writer = ResultWriter()  # saves results without blocking the window
 words_csv_path = os.path.join(project_root, 'Data', 'memory_nouns_4plus.csv')
 
 # Data folder path for output
@@ -34,29 +46,51 @@ def load_words_from_csv(csv_path):
     return words
 
 # Load words and select a random subset
+profiler.phase('word_loading')
 all_words = load_words_from_csv(words_csv_path)
 Words = random.sample(all_words, min(15, len(all_words)))  # Select 15 random words
 
 #-----------------------------------------------
 
-import pygame
-
 # Words = ['cat', 'dog', 'car', 'pen', 'box', 'cup', 'tap']
 PRESENTATION_TIME = 500  # ms , change to 500 when testing for quicker runs
 BREAK_TIME = 0 # ms - break between words, change to 50 or 0 when testing for quicker runs
 
-pygame.init()
+profiler.phase('pygame_init')
+init_pygame()  # display, font and events only; audio with RECALL_AUDIO=1
 pygame.display.set_caption('Free Recall Experiment')
-screen = pygame.display.set_mode((1280, 720))
+screen = make_screen((1280, 720))  # texture renderer with RECALL_RENDERER=texture
 
 font = pygame.font.Font(None, 74)
 button_font = pygame.font.Font(None, 48)  # Add this line
 clock = pygame.time.Clock()
+frame_timer = make_frame_timer(display=display_for(screen))
+
+# Pre-render this trial's stimuli so each onset is a single blit and flip
+stimulus_atlas = StimulusAtlas(font, Words, center=(640, 360))
 
 # Start Screen with Button
 
+profiler.phase('start_screen')
+frame_timer.phase('start', frame_ms=1000 / 30)
 waiting_for_start = True
 
+# Draw the start screen once; the loop only waits for SPACE
+frame_timer.begin_frame()
+screen.fill((255, 255, 255))  # Clear screen
+
+# Title
+title_text = font.render('Free Recall Experiment', True, (0, 0, 0))
+title_rect = title_text.get_rect(center=(640, 300))
+screen.blit(title_text, title_rect)
+
+# Instructions
+instruction_text = button_font.render('Press SPACE to start', True, (100, 100, 100))
+instruction_rect = instruction_text.get_rect(center=(640, 400))
+screen.blit(instruction_text, instruction_rect)
+
+frame_timer.flip()
+
 while waiting_for_start:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -65,90 +99,91 @@ while waiting_for_start:
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SPACE:
                 waiting_for_start = False
-
-    screen.fill((255, 255, 255))  # Clear screen
-    
-    # Title
-    title_text = font.render('Free Recall Experiment', True, (0, 0, 0))
-    title_rect = title_text.get_rect(center=(640, 300))
-    screen.blit(title_text, title_rect)
-    
-    # Instructions
-    instruction_text = button_font.render('Press SPACE to start', True, (100, 100, 100))
-    instruction_rect = instruction_text.get_rect(center=(640, 400))
-    screen.blit(instruction_text, instruction_rect)
-    
-    pygame.display.flip()
+        elif event.type == pygame.WINDOWEXPOSED:
+            frame_timer.flip()  # window uncovered: show the screen again
     clock.tick(30)
 
 # Present words once
+profiler.phase('presentation')
+frame_timer.phase('presentation')
+screen.fill((255, 255, 255))  # Clear the start screen once; onsets only redraw the stimulus cell
 for word in Words:
     for event in pygame.event.get():
         if event.type == pygame.QUIT or event.type == pygame.K_ESCAPE:
             pygame.quit()
             exit()
 
-    screen.fill((255, 255, 255))  # Clear screen
-    # pygame.draw.circle(screen, (0, 0, 255), (640, 360), 50)  # optional
-
-    text = font.render(word, True, (0, 0, 0))
-    rect = text.get_rect(center=(640, 360))
-    screen.blit(text, rect)
-
-    pygame.display.flip()
+    frame_timer.begin_frame()
+    stimulus_atlas.show(screen, word)
+    frame_timer.flip()
     pygame.time.delay(PRESENTATION_TIME)
 
     # Add break - show blank screen
-    screen.fill((255, 255, 255))
-    pygame.display.flip()
+    frame_timer.begin_frame()
+    stimulus_atlas.show_blank(screen)
+    frame_timer.flip()
     pygame.time.delay(BREAK_TIME)  # Shows blank screen for 0.5 seconds
 
 # Collect typed input
 user_words_list = []  # Store individual words
 current_word = ''
 prompt = 'Type your recall and press Enter when done:'
+prompt_line = TextLine(font, (0, 0, 0), (640, 150), prompt)
+input_line = TextLine(font, (0, 0, 255), (640, 250))
+words_line = TextLine(pygame.font.Font(None, 32), (100, 100, 100), (640, 350))  # Just use small font always
+
+# Journal the trial as each phase completes, so a crash or a closed window does not lose it
+journal = TrialJournal(data_dir, 'free_recall', writer=result_writer)
+trial_uid = journal.begin(Experiment_condition)
+journal.record('stimuli', presented=Words)
+
+profiler.phase('recall')
+frame_timer.phase('recall', frame_ms=1000 / 30)
+keystrokes = KeystrokeRecorder()
+keystrokes.start()
 
 collecting = True
+# Draw the recall screen once; after that only the line a keystroke changes is re-rendered
+frame_timer.begin_frame()
+screen.fill((255, 255, 255))
+prompt_line.draw(screen)
+frame_timer.flip()
+
 while collecting:
-    screen.fill((255, 255, 255))
-
-    # Render prompt
-    prompt_surface = font.render(prompt, True, (0, 0, 0))
-    prompt_rect = prompt_surface.get_rect(center=(640, 150))
-    screen.blit(prompt_surface, prompt_rect)
-
-    # Render current input
-    input_surface = font.render(current_word, True, (0, 0, 255))
-    input_rect = input_surface.get_rect(center=(640, 250))
-    screen.blit(input_surface, input_rect)
-
-    # Render list of already entered words
-    if user_words_list:
-        words_text = "Words entered: " + ", ".join(user_words_list)
-        # Just use small font always
-        words_surface = pygame.font.Font(None, 32).render(words_text, True, (100, 100, 100))
-        words_rect = words_surface.get_rect(center=(640, 350))
-        screen.blit(words_surface, words_rect)
-
-    pygame.display.flip()
-    clock.tick(30)
+    dirty_rects = []
 
-    for event in pygame.event.get():
+    # Block until a key arrives (at most one frame), so each keystroke is timed as it comes in
+    events = keystrokes.wait_events(1000 / 30)
+    frame_timer.begin_frame()
+    for event in events:
         if event.type == pygame.QUIT:
             collecting = False
         elif event.type == pygame.KEYDOWN:
+            keystrokes.record(event)
             if event.key == pygame.K_RETURN:
                 if current_word.strip():  # If there's a word entered
                     user_words_list.append(current_word.strip())
                     current_word = ''  # Clear for next word
+                    dirty_rects.append(words_line.update(screen, "Words entered: " + ", ".join(user_words_list)))
                 else:  # If empty input, finish
                     collecting = False
             elif event.key == pygame.K_BACKSPACE:
                 current_word = current_word[:-1]
             else:
                 current_word += event.unicode  # append typed character
+            dirty_rects.append(input_line.update(screen, current_word))
+        elif event.type == pygame.WINDOWEXPOSED:
+            frame_timer.flip()  # window uncovered: show the screen again
+
+    # Only copy the regions that changed to the display
+    dirty_rects = [rect for rect in dirty_rects if rect]
+    if dirty_rects:
+        frame_timer.update(dirty_rects)
+
+journal.record('responses', recalled=user_words_list)
 
 # Convert back to space-separated string for compatibility with existing code
+profiler.phase('scoring')
 user_input = ' '.join(user_words_list)
 
 # Final output
@@ -168,40 +203,8 @@ correct_recall = recalled_words.intersection(set(Words))
 accuracy = len(correct_recall) / len(Words) * 100
 print(f'Accuracy: {accuracy:.2f}%')
 
-Running = True
-while Running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            Running = False
-    screen.fill((255, 255, 255))
-    
-# First line - "Words were:"
-    words_label = pygame.font.Font(None, 36).render('Words were:', True, (0, 0, 0))
-    words_label_rect = words_label.get_rect(center=(640, 200))
-    screen.blit(words_label, words_label_rect)
-    
-    # Second line - just the words
-    words_only = ', '.join(Words)
-    words_surface = pygame.font.Font(None, 36).render(words_only, True, (0, 0, 0))
-    words_rect = words_surface.get_rect(center=(640, 240))
-    screen.blit(words_surface, words_rect)
-    
-    # Your typed words
-    typed_text = 'You typed: ' + user_input
-    final_surface = pygame.font.Font(None, 36).render(typed_text, True, (0, 0, 0))
-    final_rect = final_surface.get_rect(center=(640, 320))
-    screen.blit(final_surface, final_rect)
-    
-    # Accuracy
-    accuracy_surface = pygame.font.Font(None, 36).render(f'Accuracy: {accuracy:.2f}%', True, (0, 0, 0))
-    accuracy_rect = accuracy_surface.get_rect(center=(640, 400))
-    screen.blit(accuracy_surface, accuracy_rect)
-    pygame.display.flip()
-
-# Save to CSV
-
-os.makedirs(data_dir, exist_ok=True)
-csv_file = os.path.join(data_dir, 'free_recall_results.csv')
+# Save to CSV (queued: written in the background while the results are shown)
+profiler.phase('csv_save')
 
 # Split brugerens input til en liste
 
@@ -211,24 +214,59 @@ user_words_for_csv = user_input.strip().split()  # Use different variable name
 true_words_str = "[" + ", ".join(Words) + "]"
 user_words_str = "[" + ", ".join(user_words_list) + "]"
 
-# Tæl hvor mange runs der allerede er i filen
-if os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        num_runs = sum(1 for _ in f) - 1  # -1 for header
-else:
-    num_runs = 0
+# Skriv til denne stations egen shard; samles i free_recall_results.csv med python -m experiment_runtime.shards
+test_id, shard_file = append_trial(data_dir, 'free_recall', Experiment_condition, true_words_str, user_words_str, trial_uid=trial_uid, writer=journal)
+
+print(f"Data gemt i {shard_file} (test {test_id})")
 
-test_id = num_runs + 1  # næste testnummer
+# Save keystroke timings for this trial
+keystrokes.save(os.path.join(data_dir, 'free_recall_keystrokes.csv'), test_id, Experiment_condition, writer=journal)
 
-# Skriv til CSV
-file_exists_and_has_content = os.path.exists(csv_file) and os.path.getsize(csv_file) > 0
+profiler.phase('results')
+frame_timer.phase('results')
+Running = True
+# Draw the results once; the loop only waits for the window to close
+frame_timer.begin_frame()
+screen.fill((255, 255, 255))
+
+# First line - "Words were:"
+words_label = pygame.font.Font(None, 36).render('Words were:', True, (0, 0, 0))
+words_label_rect = words_label.get_rect(center=(640, 200))
+screen.blit(words_label, words_label_rect)
+
+# Second line - just the words
+words_only = ', '.join(Words)
+words_surface = pygame.font.Font(None, 36).render(words_only, True, (0, 0, 0))
+words_rect = words_surface.get_rect(center=(640, 240))
+screen.blit(words_surface, words_rect)
+
+# Your typed words
+typed_text = 'You typed: ' + user_input
+final_surface = pygame.font.Font(None, 36).render(typed_text, True, (0, 0, 0))
+final_rect = final_surface.get_rect(center=(640, 320))
+screen.blit(final_surface, final_rect)
+
+# Accuracy
+accuracy_surface = pygame.font.Font(None, 36).render(f'Accuracy: {accuracy:.2f}%', True, (0, 0, 0))
+accuracy_rect = accuracy_surface.get_rect(center=(640, 400))
+screen.blit(accuracy_surface, accuracy_rect)
+frame_timer.flip()
 
-with open(csv_file, 'a', newline='', encoding='utf-8') as f:
-    writer = csv.writer(f)
+while Running:
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            Running = False
+        elif event.type == pygame.WINDOWEXPOSED:
+            frame_timer.flip()  # window uncovered: show the screen again
+    clock.tick(30)
 
-    if not file_exists_and_has_content:
-        writer.writerow(['test', 'condition', 'true_words', 'user_words'])  # header
+# Wait until the background writer has saved this trial; only then is it committed in the journal
+if result_writer.close():
+    journal.commit()
+journal.close()
 
-    writer.writerow([test_id, Experiment_condition,true_words_str, user_words_str])
+# Save frame timing summary (only written when RECALL_FRAME_TIMING=1)
+frame_timer.save_summary(os.path.join(data_dir, 'frame_timing_summary.csv'), Experiment_condition)
 
-print(f"Data gemt i {csv_file} (test {test_id})")
+# Print and save the phase timing report (only when RECALL_PROFILE is set)
+profiler.finish(os.path.join(data_dir, 'profiling_report.csv'), Experiment_condition)
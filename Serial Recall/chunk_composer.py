@@ -0,0 +1,132 @@
+import random
+from collections import Counter
+from itertools import accumulate, permutations
+from math import perm
+
+# Letters used for the single-letter filler when chunks can't fill the sequence exactly
+FILLER_LETTERS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M',
+                  'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'X', 'Y', 'Z']
+
+
+def build_chunk_index(chunks):
+    """Group unique chunks by their length: {length: [chunk, ...]}"""
+    index = {}
+    seen = set()
+    for chunk in chunks:
+        chunk = chunk.strip().upper()
+        if not chunk or chunk in seen:
+            continue
+        seen.add(chunk)
+        index.setdefault(len(chunk), []).append(chunk)
+    return index
+
+
+def whole_chunk_compositions(target_length, available):
+    """All orderings of chunk lengths that sum exactly to target_length, given {length: number of chunks}"""
+    compositions = set()
+
+    # Depth-first search over non-increasing length multisets, then expand to every ordering
+    def extend(remaining, max_length, parts):
+        if remaining == 0:
+            compositions.update(permutations(parts))
+            return
+        for length in available:
+            if length > remaining or length > max_length:
+                continue
+            if parts.count(length) >= available[length]:
+                continue  # not enough distinct chunks of this length
+            extend(remaining - length, length, parts + [length])
+
+    extend(target_length, target_length, [])
+    return compositions
+
+
+def length_compositions(target_length, chunk_index, allow_filler=True):
+    """Whole-chunk compositions of target_length; if there are none, fall back to ones padded with a 1-letter filler"""
+    available = {length: len(group) for length, group in chunk_index.items()
+                 if 1 < length <= target_length}
+    compositions = whole_chunk_compositions(target_length, available)
+
+    if not compositions and allow_filler and target_length > 1:
+        for composition in whole_chunk_compositions(target_length - 1, available):
+            for i in range(len(composition) + 1):
+                compositions.add(composition[:i] + (1,) + composition[i:])
+
+    return sorted(compositions)
+
+
+def composition_weight(composition, chunk_index):
+    """Number of distinct letter sequences a length composition can produce (ordered chunk picks, any filler)"""
+    weight = 1
+    for length, count in Counter(composition).items():
+        weight *= len(FILLER_LETTERS) ** count if length == 1 else perm(len(chunk_index[length]), count)
+    return weight
+
+
+class ChunkComposer:
+    """Draw exact-length letter sequences built only from whole chunks (and optionally one filler letter)"""
+
+    def __init__(self, chunks, target_length=7, allow_filler=True):
+        self.target_length = target_length
+        self.index = build_chunk_index(chunks)
+        self.compositions = length_compositions(target_length, self.index, allow_filler)
+        if not self.compositions:
+            raise ValueError(f"No combination of chunks adds up to {target_length} letters")
+        # Weighting each composition by its number of sequences makes every sequence equally likely,
+        # so a length with few chunks (e.g. the one 5-letter chunk) is not over-represented
+        self.weights = [composition_weight(composition, self.index) for composition in self.compositions]
+        self.cum_weights = list(accumulate(self.weights))  # so each draw is a bisect, not a new running sum
+
+    def compose(self, rng=random):
+        """Return (letters, chunk_origins) with one origin per letter ('' for the filler letter)"""
+        composition = rng.choices(self.compositions, cum_weights=self.cum_weights)[0]
+
+        # Sample distinct chunks per length in one go so no chunk repeats within a sequence
+        picks = {}
+        for length in set(composition):
+            if length == 1:
+                continue
+            picks[length] = rng.sample(self.index[length], composition.count(length))
+
+        letters = []
+        chunk_origins = []
+        for length in composition:
+            if length == 1:
+                letters.append(rng.choice(FILLER_LETTERS))
+                chunk_origins.append('')
+                continue
+            chunk = picks[length].pop()
+            letters.extend(chunk)
+            chunk_origins.extend([chunk] * length)
+
+        return letters, chunk_origins
+
+    def generate_batch(self, n, seed=None):
+        """Draw n sequences at once with NumPy, returned as an (n, target_length) array of letter indices (0 = 'A')"""
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        cum_weights = np.array(self.cum_weights, dtype=float)
+        drawn = np.searchsorted(cum_weights, rng.random(n) * cum_weights[-1], side='right')
+
+        result = np.empty((n, self.target_length), dtype=np.uint8)
+        for c, composition in enumerate(self.compositions):
+            rows = np.flatnonzero(drawn == c)
+            if not rows.size:
+                continue
+            # Distinct chunks per length: the first columns of a random ordering of that length's chunks
+            picks = {}
+            for length in set(composition) - {1}:
+                pool = np.array([[ord(letter) - ord('A') for letter in chunk] for chunk in self.index[length]],
+                                dtype=np.uint8)
+                order = rng.random((rows.size, len(pool))).argsort(axis=1)[:, :composition.count(length)]
+                picks[length] = list(pool[order].transpose(1, 0, 2))
+
+            position = 0
+            for length in composition:
+                if length == 1:
+                    result[rows, position] = rng.integers(0, len(FILLER_LETTERS), rows.size)
+                else:
+                    result[rows, position:position + length] = picks[length].pop()
+                position += length
+        return result
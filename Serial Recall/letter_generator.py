@@ -0,0 +1,171 @@
+import csv
+import random
+
+LETTERS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M',
+           'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'X', 'Y', 'Z']
+VOWELS = 'AEIOU'
+
+# Letters that sound alike when rehearsed (rhyming sets from the serial recall literature)
+PHONOLOGICAL_GROUPS = ['BCDEGPTVZ', 'AJK', 'FSX', 'IY', 'MN', 'QUW']
+
+# Letters that look alike in upper case
+VISUAL_GROUPS = ['EF', 'OQ', 'CG', 'MNW', 'BPR', 'IJLT', 'UV', 'KX']
+
+ALL_LETTERS_MASK = (1 << len(LETTERS)) - 1
+TABLE_MAX_PREFIX = 3  # generate_batch looks acronym prefixes up to this length in a 26**k table
+
+
+def letters_to_mask(letters):
+    """Bitmask with bit i set for every letter LETTERS[i] in letters"""
+    mask = 0
+    for letter in letters:
+        mask |= 1 << (ord(letter.upper()) - ord('A'))
+    return mask
+
+
+def mask_to_letters(mask):
+    """Letters whose bit is set in mask, in alphabetical order"""
+    return [letter for i, letter in enumerate(LETTERS) if mask >> i & 1]
+
+
+def build_confusability_masks(groups=PHONOLOGICAL_GROUPS + VISUAL_GROUPS):
+    """One bitmask per letter holding every other letter it can be confused with"""
+    masks = [0] * len(LETTERS)
+    for group in groups:
+        group_mask = letters_to_mask(group)
+        for letter in group:
+            i = ord(letter) - ord('A')
+            masks[i] |= group_mask & ~(1 << i)
+    return masks
+
+
+def load_acronyms(csv_path):
+    """Read acronyms/chunks (first column) that must not appear as runs in a sequence"""
+    acronyms = []
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if row and row[0].strip().isalpha():
+                    acronyms.append(row[0].strip().upper())
+    except FileNotFoundError:
+        print(f"Warning: Could not find {csv_path}. No acronym constraint applied.")
+    return acronyms
+
+
+def build_acronym_masks(acronyms):
+    """Map each acronym prefix (as a string) to the mask of letters that would complete an acronym"""
+    blocked = {}
+    for acronym in acronyms:
+        if len(acronym) < 2:
+            continue
+        prefix, last = acronym[:-1], acronym[-1]
+        blocked[prefix] = blocked.get(prefix, 0) | letters_to_mask(last)
+    return blocked
+
+
+def pick_set_bit(mask, rng=random):
+    """Index of a uniformly chosen set bit in mask (mask must be non-zero)"""
+    for _ in range(rng.randrange(mask.bit_count())):
+        mask &= mask - 1  # drop the lowest set bit
+    return (mask & -mask).bit_length() - 1
+
+
+class LetterConstraints:
+    """Precomputed bitmask tables for drawing constrained letter sequences"""
+
+    def __init__(self, acronyms=(), avoid_confusable=True, avoid_vowels=True, avoid_repeats=True):
+        self.pool_mask = ALL_LETTERS_MASK
+        if avoid_vowels:
+            self.pool_mask &= ~letters_to_mask(VOWELS)
+        self.confusable = build_confusability_masks() if avoid_confusable else [0] * len(LETTERS)
+        self.acronym_blocks = build_acronym_masks(acronyms)
+        self.max_prefix = max((len(prefix) for prefix in self.acronym_blocks), default=0)
+        self.avoid_repeats = avoid_repeats
+
+    def allowed_next(self, sequence, used_mask):
+        """Mask of letters that may follow the given partial sequence"""
+        allowed = self.pool_mask
+        if self.avoid_repeats:
+            allowed &= ~used_mask
+        if sequence:
+            allowed &= ~self.confusable[ord(sequence[-1]) - ord('A')]
+            for k in range(1, min(self.max_prefix, len(sequence)) + 1):
+                allowed &= ~self.acronym_blocks.get(''.join(sequence[-k:]), 0)
+        return allowed
+
+    def generate(self, length=7, rng=random, max_restarts=100):
+        """Draw one sequence; each letter is picked directly from the allowed mask, no rejection"""
+        for _ in range(max_restarts):
+            sequence = []
+            used_mask = 0
+            while len(sequence) < length:
+                allowed = self.allowed_next(sequence, used_mask)
+                if not allowed:
+                    break  # dead end (very rare with the default tables), start over
+                i = pick_set_bit(allowed, rng)
+                sequence.append(LETTERS[i])
+                used_mask |= 1 << i
+            if len(sequence) == length:
+                return sequence
+        raise ValueError(f"Constraints are too strict to build a sequence of {length} letters")
+
+    def generate_batch(self, n, length=7, seed=None):
+        """Draw n sequences at once with NumPy, returned as an (n, length) array of letter indices (0 = 'A')"""
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        bits = np.arange(len(LETTERS), dtype=np.uint32)
+        confusable = np.array(self.confusable, dtype=np.uint32)
+        # Prefixes up to TABLE_MAX_PREFIX letters: one table per length, indexed by the prefix in base 26
+        acronym_tables = {}
+        acronym_items = []
+        for prefix, mask in self.acronym_blocks.items():
+            codes = [ord(c) - ord('A') for c in prefix]
+            if len(prefix) > TABLE_MAX_PREFIX:
+                acronym_items.append((np.array(codes), mask))
+                continue
+            table = acronym_tables.setdefault(len(prefix), np.zeros(len(LETTERS) ** len(prefix), dtype=np.uint32))
+            table[np.ravel_multi_index(codes, (len(LETTERS),) * len(prefix))] |= mask
+
+        result = np.empty((n, length), dtype=np.uint8)
+        todo = np.arange(n)
+        while todo.size:
+            m = todo.size
+            sequences = np.zeros((m, length), dtype=np.uint8)
+            used = np.zeros(m, dtype=np.uint32)
+            alive = np.ones(m, dtype=bool)
+            for pos in range(length):
+                allowed = np.full(m, self.pool_mask, dtype=np.uint32)
+                if self.avoid_repeats:
+                    allowed &= ~used
+                if pos > 0:
+                    allowed &= ~confusable[sequences[:, pos - 1]]
+                    for k, table in acronym_tables.items():
+                        if k <= pos:
+                            code = np.zeros(m, dtype=np.intp)
+                            for j in range(pos - k, pos):
+                                code = code * len(LETTERS) + sequences[:, j]
+                            allowed &= ~table[code]
+                    for prefix, mask in acronym_items:
+                        k = len(prefix)
+                        if k <= pos:
+                            hit = (sequences[:, pos - k:pos] == prefix).all(axis=1)
+                            allowed[hit] &= ~np.uint32(mask)
+
+                # Pick a random set bit per row: rank r among the set bits, then locate it with a cumulative sum
+                allowed_bits = (allowed[:, None] >> bits) & 1
+                counts = allowed_bits.sum(axis=1)
+                alive &= counts > 0
+                ranks = (rng.random(m) * np.maximum(counts, 1)).astype(np.int64)
+                choice = (allowed_bits.cumsum(axis=1) > ranks[:, None]).argmax(axis=1)
+                sequences[:, pos] = choice
+                used |= np.uint32(1) << choice.astype(np.uint32)
+
+            result[todo[alive]] = sequences[alive]
+            todo = todo[~alive]  # redraw only the rows that hit a dead end
+        return result
+
+
+def indices_to_letters(batch):
+    """Convert rows of letter indices from generate_batch back to lists of letters"""
+    return [[LETTERS[i] for i in row] for row in batch]
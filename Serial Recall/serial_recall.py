@@ -1,10 +1,9 @@
 import pygame
 import sys
-import random
-import time
-import csv
 import os
 
+from letter_generator import LetterConstraints, load_acronyms
+
 # Experimental condition
 experiment_condition = "normal"
 
@@ -16,36 +15,81 @@ this_dir = os.path.dirname(__file__)
 
 # Data folder path - save to Experiment_Output
 project_root = os.path.dirname(this_dir)  # Go up one level from Serial Recall
+sys.path.insert(0, project_root)  # make experiment_runtime importable
+from experiment_runtime.keystrokes import KeystrokeRecorder
+from experiment_runtime.frame_timing import make_frame_timer
+from experiment_runtime.journal import TrialJournal
+from experiment_runtime.profiling import make_profiler
+from experiment_runtime.renderer import display_for, make_screen
+from experiment_runtime.shards import append_trial
+from experiment_runtime.startup import init_pygame
+from experiment_runtime.stimuli import StimulusAtlas
+from experiment_runtime.text_input import TextLine
+from experiment_runtime.writer import ResultWriter
+profiler = make_profiler()
+result_writer = ResultWriter()  # saves results without blocking the window
 data_dir = os.path.join(project_root, 'Experiment_Output')
 
+# Acronyms that must not show up as runs of letters (same list as the chunking condition)
+acronyms_csv_path = os.path.join(project_root, 'Data', 'short_words_chunks.csv')
+letter_constraints = LetterConstraints(load_acronyms(acronyms_csv_path))
+
 # Generate random sequence of 7 letters
 def generate_letter_sequence(length=7):
-    # Using all letters for now - could be reduced to avoid confusing pairs later
-    letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 
-               'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'X', 'Y', 'Z']
-    return random.sample(letters, length)
+    # Consonants only, no confusable neighbours and no acronym-forming runs
+    return letter_constraints.generate(length)
 
 # Generate sequence of 7 letters
+profiler.phase('letter_generation')
 Letters = generate_letter_sequence(7)
 
 #-----------------------------------------------
 
-import pygame
-
 PRESENTATION_TIME = 1000  # ms per letter
 BREAK_TIME = 500 # ms - break between letters
 
-pygame.init()
+profiler.phase('pygame_init')
+init_pygame()  # display, font and events only; audio with RECALL_AUDIO=1
 pygame.display.set_caption('Serial Recall Experiment')
-screen = pygame.display.set_mode((1280, 720))
+screen = make_screen((1280, 720))  # texture renderer with RECALL_RENDERER=texture
 
 font = pygame.font.Font(None, 74)
 button_font = pygame.font.Font(None, 48)
 clock = pygame.time.Clock()
+frame_timer = make_frame_timer(display=display_for(screen))
+
+# Pre-render this trial's stimuli so each onset is a single blit and flip
+stimulus_atlas = StimulusAtlas(font, Letters, center=(640, 360))
 
 # --- Start Screen with Button ---
+profiler.phase('start_screen')
+frame_timer.phase('start', frame_ms=1000 / 30)
 waiting_for_start = True
 
+# Draw the start screen once; the loop only waits for SPACE
+frame_timer.begin_frame()
+screen.fill((255, 255, 255))  # Clear screen
+
+# Title
+title_text = font.render('Serial Recall Experiment', True, (0, 0, 0))
+title_rect = title_text.get_rect(center=(640, 250))
+screen.blit(title_text, title_rect)
+
+# Instructions
+instruction_text = button_font.render('You will see 7 letters in sequence.', True, (100, 100, 100))
+instruction_rect = instruction_text.get_rect(center=(640, 350))
+screen.blit(instruction_text, instruction_rect)
+
+instruction_text2 = button_font.render('Type them back in the SAME ORDER.', True, (100, 100, 100))
+instruction_rect2 = instruction_text2.get_rect(center=(640, 390))
+screen.blit(instruction_text2, instruction_rect2)
+
+start_text = button_font.render('Press SPACE to start', True, (0, 0, 0))
+start_rect = start_text.get_rect(center=(640, 450))
+screen.blit(start_text, start_rect)
+
+frame_timer.flip()
+
 while waiting_for_start:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -54,91 +98,88 @@ while waiting_for_start:
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SPACE:
                 waiting_for_start = False
-
-    screen.fill((255, 255, 255))  # Clear screen
-    
-    # Title
-    title_text = font.render('Serial Recall Experiment', True, (0, 0, 0))
-    title_rect = title_text.get_rect(center=(640, 250))
-    screen.blit(title_text, title_rect)
-    
-    # Instructions
-    instruction_text = button_font.render('You will see 7 letters in sequence.', True, (100, 100, 100))
-    instruction_rect = instruction_text.get_rect(center=(640, 350))
-    screen.blit(instruction_text, instruction_rect)
-    
-    instruction_text2 = button_font.render('Type them back in the SAME ORDER.', True, (100, 100, 100))
-    instruction_rect2 = instruction_text2.get_rect(center=(640, 390))
-    screen.blit(instruction_text2, instruction_rect2)
-    
-    start_text = button_font.render('Press SPACE to start', True, (0, 0, 0))
-    start_rect = start_text.get_rect(center=(640, 450))
-    screen.blit(start_text, start_rect)
-    
-    pygame.display.flip()
+        elif event.type == pygame.WINDOWEXPOSED:
+            frame_timer.flip()  # window uncovered: show the screen again
     clock.tick(30)
 
 # Present letters one by one
+profiler.phase('presentation')
+frame_timer.phase('presentation')
+screen.fill((255, 255, 255))  # Clear the start screen once; onsets only redraw the stimulus cell
 for letter in Letters:
     for event in pygame.event.get():
         if event.type == pygame.QUIT or event.type == pygame.K_ESCAPE:
             pygame.quit()
             exit()
 
-    screen.fill((255, 255, 255))  # Clear screen
-
-    text = font.render(letter, True, (0, 0, 0))
-    rect = text.get_rect(center=(640, 360))
-    screen.blit(text, rect)
-
-    pygame.display.flip()
+    frame_timer.begin_frame()
+    stimulus_atlas.show(screen, letter)
+    frame_timer.flip()
     pygame.time.delay(PRESENTATION_TIME)
 
     # Add break - show blank screen
-    screen.fill((255, 255, 255))
-    pygame.display.flip()
+    frame_timer.begin_frame()
+    stimulus_atlas.show_blank(screen)
+    frame_timer.flip()
     pygame.time.delay(BREAK_TIME)
 
 # --- Collect typed input in sequence ---
 user_sequence = ''  # Store the sequence as entered
 prompt = 'Type the letters in the same order (no spaces):'
+prompt_line = TextLine(button_font, (0, 0, 0), (640, 200), prompt)
+input_line = TextLine(font, (0, 0, 255), (640, 300))
+progress_line = TextLine(pygame.font.Font(None, 32), (100, 100, 100), (640, 400), "Letter 1/7")
 
-collecting = True
-while collecting:
-    screen.fill((255, 255, 255))
+# Journal the trial as each phase completes, so a crash or a closed window does not lose it
+journal = TrialJournal(data_dir, 'serial_recall', writer=result_writer)
+trial_uid = journal.begin(experiment_condition)
+journal.record('stimuli', presented=Letters)
 
-    # Render prompt
-    prompt_surface = button_font.render(prompt, True, (0, 0, 0))
-    prompt_rect = prompt_surface.get_rect(center=(640, 200))
-    screen.blit(prompt_surface, prompt_rect)
+profiler.phase('recall')
+frame_timer.phase('recall', frame_ms=1000 / 30)
+keystrokes = KeystrokeRecorder()
+keystrokes.start()
 
-    # Render current input with spacing for readability
-    display_sequence = ' '.join(user_sequence.upper())
-    input_surface = font.render(display_sequence, True, (0, 0, 255))
-    input_rect = input_surface.get_rect(center=(640, 300))
-    screen.blit(input_surface, input_rect)
-    
-    # Show progress
-    progress_text = f"Letter {len(user_sequence) + 1}/7" if len(user_sequence) < 7 else "Press Enter to finish"
-    progress_surface = pygame.font.Font(None, 32).render(progress_text, True, (100, 100, 100))
-    progress_rect = progress_surface.get_rect(center=(640, 400))
-    screen.blit(progress_surface, progress_rect)
-
-    pygame.display.flip()
-    clock.tick(30)
+collecting = True
+# Draw the recall screen once; after that only the lines a keystroke changes are re-rendered
+frame_timer.begin_frame()
+screen.fill((255, 255, 255))
+prompt_line.draw(screen)
+progress_line.draw(screen)
+frame_timer.flip()
 
-    for event in pygame.event.get():
+while collecting:
+    # Block until a key arrives (at most one frame), so each keystroke is timed as it comes in
+    events = keystrokes.wait_events(1000 / 30)
+    frame_timer.begin_frame()
+    for event in events:
         if event.type == pygame.QUIT:
             collecting = False
         elif event.type == pygame.KEYDOWN:
+            keystrokes.record(event)
             if event.key == pygame.K_RETURN:
                 collecting = False  # Finish when Enter is pressed
             elif event.key == pygame.K_BACKSPACE:
                 user_sequence = user_sequence[:-1]
             elif len(user_sequence) < 7 and event.unicode.isalpha():
                 user_sequence += event.unicode.upper()
+        elif event.type == pygame.WINDOWEXPOSED:
+            frame_timer.flip()  # window uncovered: show the screen again
+
+    # Current input with spacing for readability, and progress
+    display_sequence = ' '.join(user_sequence.upper())
+    progress_text = f"Letter {len(user_sequence) + 1}/7" if len(user_sequence) < 7 else "Press Enter to finish"
+
+    # Only copy the regions that changed to the display
+    dirty_rects = [input_line.update(screen, display_sequence), progress_line.update(screen, progress_text)]
+    dirty_rects = [rect for rect in dirty_rects if rect]
+    if dirty_rects:
+        frame_timer.update(dirty_rects)
+
+journal.record('responses', recalled=list(user_sequence.upper()))
 
 # Convert to list for analysis
+profiler.phase('scoring')
 user_letters = list(user_sequence.upper())
 
 # --- Analysis ---
@@ -185,74 +226,77 @@ item_accuracy = len(set(user_letters).intersection(set(Letters))) / len(Letters)
 print(f'Position Accuracy: {position_accuracy:.2f}% ({correct_positions}/{len(Letters)} correct positions)')
 print(f'Item Accuracy: {item_accuracy:.2f}% (letters recalled regardless of position)')
 
-# --- Display Results ---
-Running = True
-while Running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            Running = False
-    
-    screen.fill((255, 255, 255))
-    
-    # Original sequence
-    original_label = pygame.font.Font(None, 36).render('Original sequence:', True, (0, 0, 0))
-    original_label_rect = original_label.get_rect(center=(640, 150))
-    screen.blit(original_label, original_label_rect)
-    
-    original_sequence = ' '.join(Letters)
-    original_surface = pygame.font.Font(None, 48).render(original_sequence, True, (0, 0, 0))
-    original_rect = original_surface.get_rect(center=(640, 190))
-    screen.blit(original_surface, original_rect)
-    
-    # User sequence
-    user_label = pygame.font.Font(None, 36).render('Your sequence:', True, (0, 0, 0))
-    user_label_rect = user_label.get_rect(center=(640, 250))
-    screen.blit(user_label, user_label_rect)
-    
-    user_display = ' '.join(user_letters) if user_letters else '(none)'
-    user_surface = pygame.font.Font(None, 48).render(user_display, True, (0, 0, 255))
-    user_rect = user_surface.get_rect(center=(640, 290))
-    screen.blit(user_surface, user_rect)
-    
-    # Accuracy
-    position_acc_surface = pygame.font.Font(None, 36).render(f'Position Accuracy: {position_accuracy:.2f}%', True, (0, 0, 0))
-    position_acc_rect = position_acc_surface.get_rect(center=(640, 350))
-    screen.blit(position_acc_surface, position_acc_rect)
-    
-    item_acc_surface = pygame.font.Font(None, 36).render(f'Item Accuracy: {item_accuracy:.2f}%', True, (100, 100, 100))
-    item_acc_rect = item_acc_surface.get_rect(center=(640, 390))
-    screen.blit(item_acc_surface, item_acc_rect)
-    
-    pygame.display.flip()
-
-# --- Save to CSV ---
-os.makedirs(data_dir, exist_ok=True)
-csv_file = os.path.join(data_dir, 'serial_recall_results.csv')
-
-# Count existing runs
-if os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        num_runs = sum(1 for _ in f) - 1  # -1 for header
-else:
-    num_runs = 0
-
-test_id = num_runs + 1
+# --- Save to CSV (queued: written in the background while the results are shown) ---
+profiler.phase('csv_save')
 
 # Convert sequences to strings with brackets and commas to match free recall format
 original_sequence_str = "[" + ", ".join(Letters) + "]"
 user_sequence_str = "[" + ", ".join(list(user_sequence.upper())) + "]" if user_sequence else "[]"
 
-# Write to CSV
-file_exists_and_has_content = os.path.exists(csv_file) and os.path.getsize(csv_file) > 0
+# Append to this station's own shard; merged into serial_recall_results.csv by python -m experiment_runtime.shards
+test_id, shard_file = append_trial(data_dir, 'serial_recall', experiment_condition, original_sequence_str, user_sequence_str, trial_uid=trial_uid, writer=journal)
+
+print(f"Data saved to {shard_file} (test {test_id})")
+
+# Save keystroke timings for this trial
+keystrokes.save(os.path.join(data_dir, 'serial_recall_keystrokes.csv'), test_id, experiment_condition, writer=journal)
+
+# --- Display Results ---
+profiler.phase('results')
+frame_timer.phase('results')
+Running = True
+# Draw the results once; the loop only waits for the window to close
+frame_timer.begin_frame()
+screen.fill((255, 255, 255))
 
-with open(csv_file, 'a', newline='', encoding='utf-8') as f:
-    writer = csv.writer(f)
+# Original sequence
+original_label = pygame.font.Font(None, 36).render('Original sequence:', True, (0, 0, 0))
+original_label_rect = original_label.get_rect(center=(640, 150))
+screen.blit(original_label, original_label_rect)
+
+original_sequence = ' '.join(Letters)
+original_surface = pygame.font.Font(None, 48).render(original_sequence, True, (0, 0, 0))
+original_rect = original_surface.get_rect(center=(640, 190))
+screen.blit(original_surface, original_rect)
+
+# User sequence
+user_label = pygame.font.Font(None, 36).render('Your sequence:', True, (0, 0, 0))
+user_label_rect = user_label.get_rect(center=(640, 250))
+screen.blit(user_label, user_label_rect)
+
+user_display = ' '.join(user_letters) if user_letters else '(none)'
+user_surface = pygame.font.Font(None, 48).render(user_display, True, (0, 0, 255))
+user_rect = user_surface.get_rect(center=(640, 290))
+screen.blit(user_surface, user_rect)
+
+# Accuracy
+position_acc_surface = pygame.font.Font(None, 36).render(f'Position Accuracy: {position_accuracy:.2f}%', True, (0, 0, 0))
+position_acc_rect = position_acc_surface.get_rect(center=(640, 350))
+screen.blit(position_acc_surface, position_acc_rect)
+
+item_acc_surface = pygame.font.Font(None, 36).render(f'Item Accuracy: {item_accuracy:.2f}%', True, (100, 100, 100))
+item_acc_rect = item_acc_surface.get_rect(center=(640, 390))
+screen.blit(item_acc_surface, item_acc_rect)
+
+frame_timer.flip()
+
+while Running:
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            Running = False
+        elif event.type == pygame.WINDOWEXPOSED:
+            frame_timer.flip()  # window uncovered: show the screen again
+    clock.tick(30)
 
-    if not file_exists_and_has_content:
-                writer.writerow(['trial', ' condition', ' presented_words', ' recalled_words'])
+# Wait until the background writer has saved this trial; only then is it committed in the journal
+if result_writer.close():
+    journal.commit()
+journal.close()
 
-    writer.writerow([test_id, experiment_condition, original_sequence_str, user_sequence_str])
+# Save frame timing summary (only written when RECALL_FRAME_TIMING=1)
+frame_timer.save_summary(os.path.join(data_dir, 'frame_timing_summary.csv'), experiment_condition)
 
-print(f"Data saved to {csv_file} (test {test_id})")
+# Print and save the phase timing report (only when RECALL_PROFILE is set)
+profiler.finish(os.path.join(data_dir, 'profiling_report.csv'), experiment_condition)
 
 pygame.quit()
\ No newline at end of file
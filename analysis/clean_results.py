@@ -0,0 +1,235 @@
+"""Incremental cleaning of the raw results files into the *_cleaned.csv files.
+
+Each run only parses the raw rows appended since the last run. The byte offset reached,
+a hash of the last TAIL_BYTES before it and the normalised header are kept in a watermark
+file next to the cleaned CSV (a local file, not tracked by git). If the raw file got shorter
+or those bytes changed, the cleaned file is rebuilt from scratch. An edit further back in the
+raw file is not noticed: run with --rebuild after changing old rows.
+
+As in the original notebooks, the cleaned file is sorted by condition and raw trial number
+(ties in raw file order) and `trial` numbers each condition's trials 1, 2, ... in that order.
+New sessions restart the raw trial numbers, so their rows slot in between the old ones and
+the trials after them are renumbered; the raw number is kept in the raw_trial column.
+
+Cleaning a row means: map the header variants the scripts have written over time
+(' condition', test/true_words/user_words) to trial/condition/presented_words/recalled_words,
+parse the lists with clean_word_list, and check the trial number, condition and list length.
+Rows that fail are written to *_rejected.csv with the reason instead.
+
+Usage (from the project root):
+    python analysis/clean_results.py              # both experiments
+    python analysis/clean_results.py serial_recall --rebuild
+"""
+import ast
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+
+import pandas as pd
+
+from recall_analysis import clean_word_list, free_recall_metrics, serial_recall_metrics
+
+this_dir = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(this_dir), 'Experiment_Output')
+
+EXPERIMENTS = {
+    'free_recall': {'list_length': 15, 'conditions': ('normal', 'fast', 'break', 'math')},
+    'serial_recall': {'list_length': 7, 'conditions': ('normal', 'chunking', 'suppression', 'tapping')},
+}
+EXPERIMENT_METRICS = {'free_recall': free_recall_metrics, 'serial_recall': serial_recall_metrics}
+HEADER_ALIASES = {'test': 'trial', 'true_words': 'presented_words', 'user_words': 'recalled_words'}
+RAW_COLUMNS = ['trial', 'condition', 'presented_words', 'recalled_words']
+CLEANED_HEADER = ['trial', 'condition', 'presented_words', 'recalled_words', 'raw_trial']
+REJECTED_HEADER = ['line', 'reason', 'raw']
+TAIL_BYTES = 256  # bytes before the watermark that must be unchanged for an incremental run
+
+
+def normalize_header(fields):
+    columns = [field.strip().lower() for field in fields]
+    return [HEADER_ALIASES.get(column, column) for column in columns]
+
+
+def is_header(fields):
+    return bool(fields) and normalize_header(fields[:1])[0] == 'trial'
+
+
+def tail_hash(raw_file, offset):
+    with open(raw_file, 'rb') as f:
+        f.seek(max(offset - TAIL_BYTES, 0))
+        return hashlib.sha256(f.read(min(offset, TAIL_BYTES))).hexdigest()
+
+
+def read_new_lines(raw_file, offset):
+    """Complete lines after offset -> (lines, new offset).
+
+    An unterminated last line is only taken when it is a whole row (4 fields, closing bracket),
+    since older scripts left the final row without a newline.
+    """
+    with open(raw_file, 'rb') as f:
+        f.seek(max(offset - 1, 0))
+        continues_line = offset > 0 and f.read(1) != b'\n'
+        data = f.read()
+
+    end = data.rfind(b'\n') + 1
+    complete, rest = data[:end], data[end:]
+    if rest.strip():
+        fields = next(csv.reader([rest.decode('utf-8')]), [])
+        if len(fields) == len(RAW_COLUMNS) and fields[-1].rstrip().endswith(']'):
+            complete, end = data, len(data)
+
+    lines = complete.decode('utf-8').splitlines()
+    if continues_line and lines and not lines[0].strip():
+        lines = lines[1:]  # the newline that finishes the row taken last time
+    return lines, offset + end
+
+
+def clean_row(fields, columns, spec):
+    """Raw CSV fields -> (cleaned values, None) or (None, reason)"""
+    if len(fields) != len(columns):
+        return None, f'expected {len(columns)} fields, got {len(fields)}'
+    row = dict(zip(columns, fields))
+    if not row.get('trial', '').strip().isdigit():
+        return None, 'trial is not a number'
+    condition = row.get('condition', '').strip().lower()
+    if condition not in spec['conditions']:
+        return None, f'unknown condition {condition!r}'
+    presented = clean_word_list(row.get('presented_words'))
+    if len(presented) != spec['list_length']:
+        return None, f"{len(presented)} presented items, expected {spec['list_length']}"
+    recalled = clean_word_list(row.get('recalled_words'))
+    return [int(row['trial']), condition, presented, recalled], None
+
+
+def load_watermark(watermark_file):
+    if not os.path.exists(watermark_file):
+        return None
+    with open(watermark_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_watermark(watermark_file, watermark):
+    tmp_file = watermark_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(watermark, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, watermark_file)
+
+
+def still_valid(watermark, raw_file, cleaned_file, rejected_file):
+    """Can we continue from this watermark, or was the raw or cleaned data changed behind our back?"""
+    if not watermark or not os.path.exists(cleaned_file) or not os.path.exists(rejected_file):
+        return False
+    offset = watermark['offset']
+    return (os.path.getsize(raw_file) >= offset and tail_hash(raw_file, offset) == watermark['tail_hash']
+            and os.path.getsize(cleaned_file) == watermark['cleaned_size']
+            and os.path.getsize(rejected_file) >= watermark['rejected_size'])
+
+
+def read_rows(path):
+    """Data rows of a CSV written by this module (header skipped), lists left as their text"""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))[1:]
+
+
+def write_cleaned(cleaned_file, rows):
+    """Sort rows by condition and raw trial, number each condition's trials from 1 and write them"""
+    rows = sorted(rows, key=lambda row: (row[1], int(row[4])))  # stable: ties keep raw file order
+    counters = {}
+    for row in rows:
+        counters[row[1]] = counters.get(row[1], 0) + 1
+        row[0] = counters[row[1]]
+    tmp_file = cleaned_file + '.tmp'
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CLEANED_HEADER)
+        writer.writerows(rows)
+    os.replace(tmp_file, cleaned_file)
+
+
+def start_file(path, header, size=None):
+    """Truncate to size (rows written after the last watermark are dropped) or start over with a header"""
+    if size is None:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(header)
+    else:
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+
+
+def update_cleaned(experiment, data_dir=DATA_DIR, rebuild=False):
+    """Clean the raw rows added since the last run -> summary dict (added, rejected, rebuilt, cleaned_file)"""
+    spec = EXPERIMENTS[experiment]
+    raw_file = os.path.join(data_dir, f'{experiment}_results.csv')
+    cleaned_file = os.path.join(data_dir, f'{experiment}_results_cleaned.csv')
+    rejected_file = os.path.join(data_dir, f'{experiment}_results_rejected.csv')
+    watermark_file = os.path.join(data_dir, f'.{experiment}_results_cleaned.watermark.json')
+
+    watermark = load_watermark(watermark_file)
+    rebuilt = rebuild or not still_valid(watermark, raw_file, cleaned_file, rejected_file)
+    if rebuilt:
+        watermark = {'offset': 0, 'line': 0, 'columns': RAW_COLUMNS}
+        start_file(rejected_file, REJECTED_HEADER)
+    else:
+        start_file(rejected_file, REJECTED_HEADER, watermark['rejected_size'])
+
+    lines, offset = read_new_lines(raw_file, watermark['offset'])
+    columns, line_number = watermark['columns'], watermark['line']
+    cleaned_rows, rejected_rows = [], []
+
+    for text in lines:
+        line_number += 1
+        if not text.strip():
+            continue
+        fields = next(csv.reader(io.StringIO(text)))
+        if is_header(fields):
+            columns = normalize_header(fields)
+            continue
+        values, reason = clean_row(fields, columns, spec)
+        if reason:
+            rejected_rows.append([line_number, reason, text])
+            continue
+        raw_trial, condition, presented, recalled = values
+        cleaned_rows.append([None, condition, presented, recalled, raw_trial])
+
+    if rebuilt or cleaned_rows:
+        old_rows = [] if rebuilt else read_rows(cleaned_file)
+        write_cleaned(cleaned_file, old_rows + cleaned_rows)
+    with open(rejected_file, 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rejected_rows)
+
+    save_watermark(watermark_file, {
+        'offset': offset, 'line': line_number, 'tail_hash': tail_hash(raw_file, offset),
+        'columns': columns,
+        'cleaned_size': os.path.getsize(cleaned_file), 'rejected_size': os.path.getsize(rejected_file),
+    })
+    return {'added': len(cleaned_rows), 'rejected': len(rejected_rows), 'rebuilt': rebuilt,
+            'cleaned_file': cleaned_file}
+
+
+def read_cleaned(experiment, data_dir=DATA_DIR):
+    """The cleaned trials of an experiment as a DataFrame with parsed lists (brought up to date first)"""
+    cleaned_file = update_cleaned(experiment, data_dir)['cleaned_file']
+    return pd.read_csv(cleaned_file, converters={'presented_words': ast.literal_eval,
+                                                 'recalled_words': ast.literal_eval})
+
+
+def load_results(experiment, data_dir=DATA_DIR):
+    """Per-trial metrics of an experiment, from its cleaned results (brought up to date first)"""
+    return EXPERIMENT_METRICS[experiment](read_cleaned(experiment, data_dir))
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    experiments = args or list(EXPERIMENTS)
+    for experiment in experiments:
+        summary = update_cleaned(experiment, rebuild='--rebuild' in sys.argv)
+        mode = 'rebuilt' if summary['rebuilt'] else 'updated'
+        print(f"{experiment}: {mode}, {summary['added']} rows cleaned, {summary['rejected']} rejected "
+              f"-> {summary['cleaned_file']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
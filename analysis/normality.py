@@ -0,0 +1,145 @@
+"""Normality checks for the per-trial metrics, run as one batched and cached battery.
+
+normality_battery() takes the metrics DataFrame of each experiment (as metrics_dataframe returns
+it) and runs Shapiro-Wilk, D'Agostino-Pearson, Kolmogorov-Smirnov (against a normal with the
+sample's mean and SD) and Jarque-Bera on every experiment x condition x metric group, plus every
+metric pooled over the conditions (condition 'all'). It returns one tidy row per group and test.
+
+Results are cached in Experiment_Output/.normality_cache.json under a hash of each group's
+values, so after new trials only the groups whose data changed are tested again. The groups
+left to test are spread over worker processes when there are enough values to pay for them.
+
+Usage (from the project root):
+    python analysis/normality.py        # both experiments, from their cleaned results files
+"""
+import hashlib
+import json
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from scipy.stats import jarque_bera, kstest, normaltest, shapiro
+
+from clean_results import DATA_DIR, EXPERIMENT_METRICS, load_results
+
+CACHE_FILE = os.path.join(DATA_DIR, '.normality_cache.json')
+METRICS = ('accuracy', 'primacy', 'recency')
+POOLED = 'all'                  # condition label of the groups pooled over all conditions
+PARALLEL_MIN_VALUES = 200_000   # fewer values than this are tested in this process
+
+
+def ks_normal(values):
+    """Kolmogorov-Smirnov test against a normal with the sample's own mean and SD"""
+    return kstest(values, 'norm', args=(np.mean(values), np.std(values, ddof=1)))
+
+
+# Test name -> (function returning (statistic, p), smallest sample it accepts)
+TESTS = {
+    'shapiro': (shapiro, 3),
+    'normaltest': (normaltest, 8),
+    'kstest': (ks_normal, 2),
+    'jarque_bera': (jarque_bera, 2),
+}
+
+
+def test_normality(values, tests=tuple(TESTS)):
+    """{test: [statistic, p]} for one sample; NaN when it is too small or constant"""
+    results = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # e.g. Shapiro-Wilk's note that p may be inaccurate above 5000 values
+        for name in tests:
+            func, min_n = TESTS[name]
+            if len(values) < min_n or np.ptp(values) == 0:
+                results[name] = [np.nan, np.nan]
+            else:
+                statistic, p_value = func(values)
+                results[name] = [float(statistic), float(p_value)]
+    return results
+
+
+def values_hash(values):
+    """Key of a group in the cache; the tests do not depend on the order of the values"""
+    return hashlib.sha256(np.sort(values).tobytes()).hexdigest()
+
+
+def load_cache(cache_file):
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_cache(cache_file, cache):
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
+
+
+def metric_groups(frames, metrics, group_col='condition'):
+    """(experiment, condition, metric, float64 values) for every group, the pooled ones first"""
+    groups = []
+    for experiment, results_df in frames.items():
+        for metric in metrics:
+            if metric not in results_df:
+                continue
+            data = results_df[[group_col, metric]].dropna()
+            values = pd.to_numeric(data[metric]).values.astype(np.float64)
+            groups.append((experiment, POOLED, metric, values))
+            for condition, index in data.groupby(group_col).indices.items():
+                groups.append((experiment, condition, metric, values[index]))
+    return groups
+
+
+def normality_battery(frames, metrics=METRICS, tests=tuple(TESTS), alpha=0.05, group_col='condition',
+                      cache_file=CACHE_FILE, processes=None):
+    """All normality tests for every experiment x condition x metric -> tidy DataFrame.
+
+    frames maps an experiment name to its metrics DataFrame (metrics missing from one are
+    skipped). Columns: experiment, condition, metric, test, n, statistic, p_value and normal
+    (p_value > alpha). cache_file=None turns the cache off; processes=1 never starts workers.
+    """
+    groups = metric_groups(frames, metrics, group_col)
+    cache = load_cache(cache_file)
+    keys = [values_hash(values) for _, _, _, values in groups]
+
+    # Only groups (or tests) not in the cache are run, each distinct sample once
+    todo = {}
+    for key, (_, _, _, values) in zip(keys, groups):
+        if key not in todo and any(name not in cache.get(key, {}) for name in tests):
+            todo[key] = values
+    if todo:
+        samples = list(todo.values())
+        if processes != 1 and len(samples) > 1 and sum(map(len, samples)) >= PARALLEL_MIN_VALUES:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(test_normality, samples, repeat(tests)))
+        else:
+            results = [test_normality(values, tests) for values in samples]
+        for key, result in zip(todo, results):
+            cache.setdefault(key, {}).update(result)
+        if cache_file:
+            save_cache(cache_file, cache)
+
+    rows = []
+    for key, (experiment, condition, metric, values) in zip(keys, groups):
+        for name in tests:
+            statistic, p_value = cache[key][name]
+            rows.append({'experiment': experiment, 'condition': condition, 'metric': metric, 'test': name,
+                         'n': len(values), 'statistic': statistic, 'p_value': p_value,
+                         'normal': bool(p_value > alpha)})
+    return pd.DataFrame(rows)
+
+
+def main():
+    frames = {experiment: load_results(experiment) for experiment in EXPERIMENT_METRICS}
+    table = normality_battery(frames)
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""Monte Carlo power analysis: how many trials per condition the condition effects need.
+
+fit_condition_params() fits the recall model of synthetic_data (baseline plus primacy and
+recency gradients, see recall_curve) to each condition's serial position curve, plus a spread:
+the SD of a per-trial shift of all positions on the logit scale, fitted to the variance of the
+number of positions recalled per trial. model_metrics() then simulates whole trials: presented
+lists resampled from the condition's recorded lists (so repeated letters occur as often as in the
+data), recalled positions drawn from the model, all scored by the experiment's metric function
+(free_recall_metrics / serial_recall_metrics), as the real trials are.
+
+simulate_power() draws n_replicates experiments with n trials per condition from those scored
+trials, for every n asked for, and runs the Kruskal-Wallis, Mann-Whitney U and Dunn tests of
+rank_tests on them. Power is the share of replicates with p < alpha (the pairwise p-values
+corrected for the pairs, as in compare_conditions). Each metric takes few distinct values, so one
+condition of a replicate is a multinomial draw of how many trials reach each value. That count
+table is what rank_tests.PooledRanks ranks, so all replicates of one n are tested at once on a
+(replicate x condition x value) stack. The n values are spread over worker processes, each with
+its own seed from one SeedSequence, so the result does not depend on the number of processes.
+simulate_power() also takes any other per-trial metrics, e.g. those of synthetic_data trials
+for a known ground truth.
+
+check_model() asks whether the observed mean and SD of every metric and condition are plausible
+for the model at the observed number of trials (parametric bootstrap, two-sided p-values). Where
+they are not, the model misses the data and the power of that metric is off; it is optimistic
+when the model's SD is too small. Trials are independent given their condition and spread;
+differences between participants are not modelled beyond that.
+
+Usage (from the project root):
+    python analysis/power_analysis.py serial_recall          # fitted to the cleaned results
+    python analysis/power_analysis.py free_recall 5000       # 5000 replicates per trial count
+"""
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, repeat
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import brentq, curve_fit
+from scipy.special import expit, logit
+
+from clean_results import EXPERIMENT_METRICS, EXPERIMENTS, load_results, read_cleaned
+from rank_tests import METRICS, PooledRanks, adjust_pvalues
+from recall_analysis import serial_position_analysis
+from synthetic_data import recall_curve
+from trial_encoding import PAD, EncodedTrials, as_encoded, occurs_in
+
+N_VALUES = (5, 10, 15, 20, 30, 40, 60, 80, 100)
+N_REPLICATES = 2000
+PARALLEL_MIN_REPLICATES = 20_000  # fewer replicates in total than this are simulated in this process
+N_MODEL_TRIALS = 100_000  # simulated trials per condition the replicates are drawn from
+N_CHECK_REPLICATES = 2000
+CHECK_ALPHA = 0.01
+
+# recall_curve parameter -> (lower, upper) bound of the fit
+PARAM_BOUNDS = {
+    'baseline': (0, 1),
+    'primacy': (0, 1),
+    'primacy_decay': (0.1, 10),
+    'recency': (0, 1),
+    'recency_decay': (0.1, 10),
+}
+MAX_SPREAD = 10
+# Gauss-Hermite nodes and weights for averaging over a standard normal per-trial shift
+NODES, WEIGHTS = np.polynomial.hermite_e.hermegauss(41)
+WEIGHTS = WEIGHTS / WEIGHTS.sum()
+
+
+def fit_recall_curve(position_probs):
+    """recall_curve parameters fitted (least squares) to one condition's recall probability per position"""
+    probs = np.asarray(position_probs, dtype=float)
+    L = len(probs)
+    names = list(PARAM_BOUNDS)
+    lower, upper = np.array(list(PARAM_BOUNDS.values())).T
+    start = [probs.min(), probs[0] - probs.min(), 1.5, probs[-1] - probs.min(), 1.5]
+    start = np.clip(start, lower + 1e-6, upper - 1e-6)
+
+    def curve(_, *values):
+        return recall_curve(dict(zip(names, values)), L)
+
+    values, _ = curve_fit(curve, np.arange(L), probs, p0=start, bounds=(lower, upper))
+    return dict(zip(names, values.tolist()))
+
+
+def logit_locations(probs, spread):
+    """Logit of every position such that, averaged over the per-trial shift, it is recalled with probs"""
+    probs = np.clip(probs, 1e-6, 1 - 1e-6)
+    if spread == 0:
+        return logit(probs)
+    return np.array([brentq(lambda a: WEIGHTS @ expit(a + spread * NODES) - p, -200, 200) for p in probs])
+
+
+def count_variance(probs, spread):
+    """Variance of the number of positions recalled per trial under the model"""
+    p = expit(logit_locations(probs, spread) + spread * NODES[:, None])  # (node x position)
+    means = p.sum(axis=1)
+    return WEIGHTS @ (p * (1 - p)).sum(axis=1) + WEIGHTS @ means ** 2 - (WEIGHTS @ means) ** 2
+
+
+def fit_spread(probs, observed_variance):
+    """Spread that gives the observed variance of the recalled count (0 when even independent positions exceed it)"""
+    if count_variance(probs, 0) >= observed_variance:
+        return 0.0
+    if count_variance(probs, MAX_SPREAD) <= observed_variance:
+        return float(MAX_SPREAD)
+    return brentq(lambda spread: count_variance(probs, spread) - observed_variance, 0, MAX_SPREAD)
+
+
+def fit_condition_params(df_test, list_length):
+    """{condition: fitted recall_curve parameters and spread} from the trials of one experiment"""
+    curves = serial_position_analysis(df_test, list_length)['per_condition']
+    trials = as_encoded(df_test, list_length)
+    valid = trials.full & (trials.r_len > 0)
+    counts = (occurs_in(trials.presented, trials.recalled) & valid[:, None]).sum(axis=1)
+
+    params = {}
+    for condition, probs in curves.items():
+        params[condition] = fit_recall_curve(probs)
+        in_condition = valid & (trials.conditions[trials.cond] == condition)
+        params[condition]['spread'] = fit_spread(recall_curve(params[condition], list_length),
+                                                 counts[in_condition].var(ddof=1))
+    return params
+
+
+def simulate_trials(trials, params, n, rng):
+    """EncodedTrials of n model trials per condition, on lists resampled from that condition's trials"""
+    L = trials.list_length
+    presented, recalled, cond = [], [], []
+    for c, condition in enumerate(trials.conditions):
+        if condition not in params:
+            continue
+        lists = trials.presented[rng.choice(np.flatnonzero(trials.cond == c), n)]
+        spread = params[condition]['spread']
+        locations = logit_locations(recall_curve(params[condition], L), spread)
+        hit = rng.random((n, L)) < expit(locations + spread * rng.standard_normal((n, 1)))
+        presented.append(lists)
+        recalled.append(np.where(hit, lists, PAD).astype(lists.dtype))
+        cond.append(np.full(n, c))
+
+    presented, recalled, cond = (np.concatenate(arrays) for arrays in (presented, recalled, cond))
+    r_len = (recalled != PAD).sum(axis=1).astype(np.int16)
+    return EncodedTrials(presented, recalled, np.full(len(cond), L, dtype=np.int16), r_len, cond,
+                         trials.conditions, np.arange(1, len(cond) + 1), L)
+
+
+def model_metrics(df_test, params, experiment, n=N_MODEL_TRIALS, seed=0):
+    """Per-trial metrics of n model trials per condition, scored like the experiment's real trials"""
+    trials = as_encoded(df_test, EXPERIMENTS[experiment]['list_length'])
+    return EXPERIMENT_METRICS[experiment](simulate_trials(trials, params, n, np.random.default_rng(seed)))
+
+
+def metric_distributions(results_df, metrics=METRICS, group_col='condition'):
+    """(conditions, {metric: (distinct values, (condition x value) probabilities)}), conditions sorted"""
+    codes, conditions = pd.factorize(results_df[group_col], sort=True)
+    distributions = {}
+    for metric in metrics:
+        values = pd.to_numeric(results_df[metric]).values
+        present = ~np.isnan(values)
+        ranks = PooledRanks.from_samples(values[present], codes[present], len(conditions))
+        distributions[metric] = (ranks.values, ranks.counts / ranks.n[:, None])
+    return list(conditions), distributions
+
+
+def check_model(observed_df, model_df, metrics=METRICS, group_col='condition', n_replicates=N_CHECK_REPLICATES,
+                alpha=CHECK_ALPHA, seed=0):
+    """Observed vs model mean and SD of every metric and condition.
+
+    p_mean / p_sd are two-sided parametric bootstrap p-values: how often n_replicates model
+    samples with the observed number of trials have a mean (SD) at least as far out as the
+    observed one. ok is False when either is below alpha.
+    """
+    rng = np.random.default_rng(seed)
+    conditions, distributions = metric_distributions(model_df, metrics, group_col)
+    rows = []
+    for metric, (values, pmfs) in distributions.items():
+        observed = observed_df.groupby(group_col)[metric].agg(['count', 'mean', 'std'])
+        for condition, pmf in zip(conditions, pmfs):
+            n, mean, sd = observed.loc[condition]
+            counts = rng.multinomial(int(n), pmf, size=n_replicates)
+            means = counts @ values / n
+            sds = np.sqrt(np.maximum(counts @ values ** 2 - n * means ** 2, 0) / (n - 1))
+            rows.append({'metric': metric, 'condition': condition, 'n': int(n),
+                         'observed_mean': mean, 'model_mean': pmf @ values,
+                         'p_mean': min(1.0, 2 * min(np.mean(means <= mean), np.mean(means >= mean))),
+                         'observed_sd': sd, 'model_sd': np.sqrt(pmf @ (values - pmf @ values) ** 2),
+                         'p_sd': min(1.0, 2 * min(np.mean(sds <= sd), np.mean(sds >= sd)))})
+    check = pd.DataFrame(rows)
+    check['ok'] = (check['p_mean'] >= alpha) & (check['p_sd'] >= alpha)
+    return check
+
+
+def replicate_power(distributions, n, n_replicates, alpha, correction, seed):
+    """{metric: {test: power per comparison}} of n_replicates simulated experiments with n trials per condition"""
+    rng = np.random.default_rng(seed)
+    power = {}
+    for metric, (values, pmfs) in distributions.items():
+        counts = np.stack([rng.multinomial(n, pmf, size=n_replicates) for pmf in pmfs], axis=1)
+        ranks = PooledRanks(values, counts)
+        pairs = np.array(list(combinations(range(len(pmfs)), 2)), dtype=np.intp).reshape(-1, 2)
+        a, b = pairs[:, 0], pairs[:, 1]
+
+        _, p_kruskal = ranks.kruskal()
+        _, p_mannwhitney = ranks.mannwhitney(a, b)
+        _, p_dunn = ranks.dunn(a, b)
+        power[metric] = {
+            'kruskal': np.mean(p_kruskal[:, None] < alpha, axis=0),
+            'mannwhitney': np.mean(adjust_pvalues(p_mannwhitney, correction) < alpha, axis=0),
+            'dunn': np.mean(adjust_pvalues(p_dunn, correction) < alpha, axis=0),
+        }
+    return power
+
+
+def simulate_power(results_df, n_values=N_VALUES, n_replicates=N_REPLICATES, metrics=METRICS,
+                   group_col='condition', alpha=0.05, correction='bonferroni', seed=0, processes=None):
+    """Power of every test, metric and pair of conditions for each number of trials per condition.
+
+    results_df holds one row of metrics per trial (model_metrics, or any other output of
+    free_recall_metrics / serial_recall_metrics) to draw the trials from. Returns a tidy DataFrame: metric, n_per_condition,
+    test ('kruskal', 'mannwhitney', 'dunn'), comparison ('all' for Kruskal-Wallis) and power.
+    processes=1 never starts workers.
+    """
+    conditions, distributions = metric_distributions(results_df, metrics, group_col)
+    seeds = np.random.SeedSequence(seed).spawn(len(n_values))
+    args = (repeat(distributions), n_values, repeat(n_replicates), repeat(alpha), repeat(correction), seeds)
+    if processes != 1 and len(n_values) > 1 and n_replicates * len(n_values) >= PARALLEL_MIN_REPLICATES:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(replicate_power, *args))
+    else:
+        results = list(map(replicate_power, *args))
+
+    comparisons = [f"{cond1} vs {cond2}" for cond1, cond2 in combinations(conditions, 2)]
+    rows = []
+    for n, power in zip(n_values, results):
+        for metric, tests in power.items():
+            for test, test_power in tests.items():
+                labels = ['all'] if test == 'kruskal' else comparisons
+                rows.extend({'metric': metric, 'n_per_condition': n, 'test': test, 'comparison': label,
+                             'power': float(p)} for label, p in zip(labels, test_power))
+    return pd.DataFrame(rows)
+
+
+def required_trials(power_df, target=0.8):
+    """Fewest trials per condition reaching the target power, per metric, test and comparison (NA: not reached)"""
+    reached = power_df[power_df['power'] >= target]
+    fewest = reached.groupby(['metric', 'test', 'comparison'])['n_per_condition'].min()
+    keys = power_df[['metric', 'test', 'comparison']].drop_duplicates()
+    required = keys.join(fewest, on=['metric', 'test', 'comparison']).reset_index(drop=True)
+    required['n_per_condition'] = required['n_per_condition'].astype('Int64')
+    return required
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in EXPERIMENTS:
+        print(__doc__)
+        return 1
+    experiment = sys.argv[1]
+    n_replicates = int(sys.argv[2]) if len(sys.argv) > 2 else N_REPLICATES
+
+    df_test = read_cleaned(experiment)
+    params = fit_condition_params(df_test, EXPERIMENTS[experiment]['list_length'])
+    print(f"Fitted recall model ({experiment}):")
+    print(pd.DataFrame(params).T.to_string(float_format=lambda x: f"{x:.3f}"))
+
+    model = model_metrics(df_test, params, experiment)
+    check = check_model(load_results(experiment), model)
+    print(f"\nObserved vs model metrics (p: parametric bootstrap at the observed n, ok: both p >= {CHECK_ALPHA}):")
+    print(check.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if not check['ok'].all():
+        print("\nWarning: the model misses the data where ok is False; the power of those metrics is off "
+              "(optimistic when model_sd < observed_sd).")
+
+    power = simulate_power(model, n_replicates=n_replicates)
+    for metric, rows in power[power['test'] != 'dunn'].groupby('metric', sort=False):
+        print(f"\nPower ({metric}, alpha 0.05, Mann-Whitney Bonferroni corrected) by trials per condition:")
+        print(rows.pivot(index='n_per_condition', columns='comparison', values='power')
+              .to_string(float_format=lambda x: f"{x:.2f}"))
+    print("\nTrials per condition for 80% power:")
+    print(required_trials(power).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Rank-based comparisons of conditions, all derived from one ranking of the pooled data.
+
+For each metric the values of all conditions are sorted once (np.unique) into a table of how
+often every distinct value occurs per condition. Everything else follows from that table:
+
+    ranks               average rank of each distinct value (ties share it)
+    Kruskal-Wallis H    rank sums per condition
+    Dunn's z            mean pooled ranks per condition (as scikit-posthocs' posthoc_dunn)
+    Mann-Whitney U      U of a vs b = sum over values of a's count * (b's count below the
+                        value + half b's count at it), for all pairs with one matrix product
+                        instead of re-ranking every pair of samples
+
+with the tie corrections scipy.stats uses (small tie-free pairs get scipy's exact
+Mann-Whitney p-value, as mannwhitneyu's default does). Pairwise p-values are adjusted for
+the comparisons within each metric and test: Bonferroni, Holm and Benjamini-Hochberg FDR.
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, mannwhitneyu, norm
+
+METRICS = ('accuracy', 'primacy', 'recency')
+CORRECTIONS = ('bonferroni', 'holm', 'fdr_bh')
+EXACT_MAX_N = 8  # scipy's 'auto' method: exact Mann-Whitney p when a sample is this small and there are no ties
+
+
+def adjust_pvalues(p_values, method='holm'):
+    """p-values adjusted for multiple comparisons ('bonferroni', 'holm' or 'fdr_bh'), capped at 1.
+
+    The comparisons are along the last axis (one family per row of a 2-D array).
+    """
+    p = np.asarray(p_values, dtype=float)
+    m = p.shape[-1]
+    if method == 'bonferroni':
+        return np.minimum(p * m, 1)
+
+    order = np.argsort(p, axis=-1, kind='stable')
+    ranked = np.take_along_axis(p, order, axis=-1)
+    if method == 'holm':
+        adjusted = np.maximum.accumulate(ranked * (m - np.arange(m)), axis=-1)
+    elif method == 'fdr_bh':
+        adjusted = np.flip(np.minimum.accumulate(np.flip(ranked * m / np.arange(1, m + 1), -1), axis=-1), -1)
+    else:
+        raise ValueError(f"unknown correction {method!r}, use one of {CORRECTIONS}")
+    out = np.empty_like(p)
+    np.put_along_axis(out, order, np.minimum(adjusted, 1), axis=-1)
+    return out
+
+
+class PooledRanks:
+    """Counts of every distinct value per group, with the pooled ranks derived from them.
+
+    counts is (group, value) for one dataset; leading axes (e.g. simulated replicates) are
+    kept, and every statistic then has them too.
+    """
+
+    def __init__(self, values, counts):
+        self.values = values                          # sorted distinct values
+        self.counts = np.asarray(counts, dtype=float)
+        self.ties = self.counts.sum(axis=-2)          # how often each distinct value occurs
+        self.n = self.counts.sum(axis=-1)             # values per group
+        self.N = self.ties.sum(axis=-1)
+        below = np.cumsum(self.ties, axis=-1) - self.ties
+        self.ranks = below + (self.ties + 1) / 2      # average rank of each distinct value
+        self.rank_sums = (self.counts @ self.ranks[..., None])[..., 0]
+        self.tie_term = np.sum(self.ties ** 3 - self.ties, axis=-1)
+
+    @classmethod
+    def from_samples(cls, values, groups, n_groups):
+        """From the values and the group index of each"""
+        values, inverse = np.unique(values, return_inverse=True)
+        counts = np.zeros((n_groups, len(values)))
+        np.add.at(counts, (groups, inverse), 1)
+        return cls(values, counts)
+
+    def kruskal(self):
+        """(H, p) over all groups, tie-corrected like scipy.stats.kruskal"""
+        N, k = self.N, self.n.shape[-1]
+        h = 12 / (N * (N + 1)) * np.sum(self.rank_sums ** 2 / self.n, axis=-1) - 3 * (N + 1)
+        correction = 1 - self.tie_term / (N ** 3 - N)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            h = np.where(correction > 0, h / correction, np.nan)[()]
+        return h, chi2.sf(h, k - 1)
+
+    def dunn(self, a, b):
+        """(z, two-sided p) of Dunn's test between groups a and b (arrays of group indices)"""
+        N = np.asarray(self.N)[..., None]
+        tie_term = np.asarray(self.tie_term)[..., None]
+        mean_ranks = self.rank_sums / self.n
+        sigma = np.sqrt((N * (N + 1) / 12 - tie_term / (12 * (N - 1))) * (1 / self.n[..., a] + 1 / self.n[..., b]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (mean_ranks[..., a] - mean_ranks[..., b]) / sigma
+        return z, np.minimum(2 * norm.sf(np.abs(z)), 1)
+
+    def u_matrix(self):
+        """U of every group (rows) against every other group (columns)"""
+        below = np.cumsum(self.counts, axis=-1) - self.counts
+        return self.counts @ np.swapaxes(below + self.counts / 2, -1, -2)
+
+    def mannwhitney(self, a, b):
+        """(U of a, two-sided p) of Mann-Whitney U tests between groups a and b"""
+        u1 = self.u_matrix()[..., a, b]
+
+        n1, n2 = self.n[..., a], self.n[..., b]
+        pair_ties = self.counts[..., a, :] + self.counts[..., b, :]
+        tie_term = np.sum(pair_ties ** 3 - pair_ties, axis=-1)
+        n = n1 + n2
+        s = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+        u = np.maximum(u1, n1 * n2 - u1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (u - n1 * n2 / 2 - 0.5) / s
+        p = np.minimum(2 * norm.sf(z), 1)
+
+        exact = ((n1 <= EXACT_MAX_N) | (n2 <= EXACT_MAX_N)) & (tie_term == 0)
+        for index in zip(*np.nonzero(exact)):
+            counts = self.counts[index[:-1]]
+            x = np.repeat(self.values, counts[a[index[-1]]].astype(int))
+            y = np.repeat(self.values, counts[b[index[-1]]].astype(int))
+            p[index] = mannwhitneyu(x, y, alternative='two-sided', method='exact').pvalue
+        return u1, p
+
+
+def compare_conditions(results_df, metrics=METRICS, group_col='condition'):
+    """Kruskal-Wallis, pairwise Mann-Whitney U and Dunn tests for every metric.
+
+    Returns (omnibus, pairwise) DataFrames: one omnibus row per metric, and one pairwise row
+    per metric, test ('mannwhitney' / 'dunn') and pair of conditions with the raw p_value and
+    p_bonferroni, p_holm and p_fdr_bh. statistic is U of cond1 or Dunn's z (positive when cond1
+    ranks higher); effect_size is 1 - 2U / (n1 * n2) as in pairwise_mannwhitney.
+    """
+    omnibus, pairwise = [], []
+    for metric in metrics:
+        data = results_df[[group_col, metric]].dropna()
+        values = pd.to_numeric(data[metric]).values
+        codes, conditions = pd.factorize(data[group_col], sort=True)
+        ranks = PooledRanks.from_samples(values, codes, len(conditions))
+        h_stat, p_value = ranks.kruskal()
+        omnibus.append({'metric': metric, 'n': int(ranks.N), 'k': len(conditions),
+                        'h_stat': h_stat, 'df': len(conditions) - 1, 'p_value': p_value})
+
+        pairs = np.array(list(combinations(range(len(conditions)), 2)), dtype=np.intp).reshape(-1, 2)
+        a, b = pairs[:, 0], pairs[:, 1]
+        u_stat, p_mw = ranks.mannwhitney(a, b)
+        z, p_dunn = ranks.dunn(a, b)
+        medians = data.groupby(codes)[metric].median().values
+        effect_size = 1 - 2 * u_stat / (ranks.n[a] * ranks.n[b])
+
+        for test, statistic, p in (('mannwhitney', u_stat, p_mw), ('dunn', z, p_dunn)):
+            adjusted = {f'p_{method}': adjust_pvalues(p, method) for method in CORRECTIONS}
+            for i in range(len(pairs)):
+                cond1, cond2 = conditions[a[i]], conditions[b[i]]
+                pairwise.append({
+                    'metric': metric, 'test': test, 'comparison': f"{cond1} vs {cond2}",
+                    'cond1': cond1, 'cond2': cond2, 'n1': int(ranks.n[a[i]]), 'n2': int(ranks.n[b[i]]),
+                    'statistic': statistic[i], 'p_value': p[i],
+                    **{name: adjusted_p[i] for name, adjusted_p in adjusted.items()},
+                    'effect_size': effect_size[i], 'median_diff': medians[a[i]] - medians[b[i]],
+                })
+
+    return pd.DataFrame(omnibus), pd.DataFrame(pairwise)
+
+
+def pvalue_matrix(pairwise, metric='accuracy', test='dunn', column='p_bonferroni'):
+    """Square condition x condition table of one p-value column (1 on the diagonal), like posthoc_dunn"""
+    rows = pairwise[(pairwise['metric'] == metric) & (pairwise['test'] == test)]
+    conditions = sorted(set(rows['cond1']) | set(rows['cond2']))
+    matrix = pd.DataFrame(1.0, index=conditions, columns=conditions)
+    for cond1, cond2, p in zip(rows['cond1'], rows['cond2'], rows[column]):
+        matrix.loc[cond1, cond2] = matrix.loc[cond2, cond1] = p
+    return matrix
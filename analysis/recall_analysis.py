@@ -0,0 +1,267 @@
+"""Analysis functions shared by the Free Recall, Serial Recall and statistics notebooks."""
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+from rank_tests import compare_conditions
+from trial_encoding import as_encoded, first_occurrence, occurs_in
+
+
+# --- Improved cleaning function ---
+def clean_word_list(val):
+    """Convert messy string/list representations into a flat list of clean, lowercase words."""
+    if pd.isna(val):
+        return []
+
+    try:
+        # Safely parse Python literal
+        parsed = ast.literal_eval(val)
+    except (ValueError, SyntaxError):
+        parsed = str(val)
+
+    # Flatten and clean
+    flat_list = []
+    if isinstance(parsed, list):
+        for item in parsed:
+            # If item is a list, flatten
+            if isinstance(item, list):
+                for sub in item:
+                    # Remove brackets, commas, extra spaces
+                    w = re.sub(r"[\[\],]", "", str(sub)).strip().lower()
+                    if w:
+                        flat_list.append(w)
+            else:
+                # Remove brackets, commas, extra spaces
+                w = re.sub(r"[\[\],]", "", str(item)).strip().lower()
+                if w:
+                    # split by spaces if there are multiple words
+                    flat_list.extend([word for word in w.split() if word])
+    else:
+        w = re.sub(r"[\[\],]", "", str(parsed)).strip().lower()
+        flat_list.extend([word for word in w.split() if word])
+
+    return flat_list
+
+
+def calculate_free_recall_metrics(presented, recalled):
+    """Calculate primacy, recency and accuracy for 15-word lists"""
+    # Check length & empty recall
+    if len(presented) != 15 or not recalled:
+        return {'primacy': 0, 'recency': 0, 'accuracy': 0}
+
+    # Clean both lists
+    presented_clean = [word.strip().lower() for word in presented]
+    recalled_clean = [word.strip().lower() for word in recalled]
+
+    # Accuracy: proportion of recalled words that were in presented list
+    correct_recalls = sum(1 for word in recalled_clean if word in presented_clean)
+    accuracy = correct_recalls / len(presented_clean)
+
+    # Primacy: first 5 words
+    primacy_words = presented_clean[:5]
+    primacy_recalled = sum(1 for word in recalled_clean if word in primacy_words)
+    primacy = primacy_recalled / 5
+
+    # Recency: last 5 words
+    recency_words = presented_clean[-5:]
+    recency_recalled = sum(1 for word in recalled_clean if word in recency_words)
+    recency = recency_recalled / 5
+
+    return {
+        'primacy': primacy,
+        'recency': recency,
+        'accuracy': accuracy
+    }
+
+
+def calculate_serial_recall_metrics(presented, recalled):
+    """Calculate primacy, recency, and accuracy for 7-word lists."""
+    if len(presented) != 7 or not recalled:
+        return {'primacy': 0, 'recency': 0, 'accuracy': 0}
+
+    # Clean both lists
+    presented_clean = [w.strip().lower() for w in presented]
+    recalled_clean = [w.strip().lower() for w in recalled]
+
+    # Accuracy: proportion of unique recalled words that were in presented list
+    correct_recalls = len(set(recalled_clean) & set(presented_clean))
+    accuracy = correct_recalls / len(presented_clean)
+
+    # Primacy: first 3 words
+    primacy_words = set(presented_clean[:3])
+    primacy_recalled = len(primacy_words & set(recalled_clean))
+    primacy = primacy_recalled / 3  # max 1.0
+
+    # Recency: last 3 words
+    recency_words = set(presented_clean[-3:])
+    recency_recalled = len(recency_words & set(recalled_clean))
+    recency = recency_recalled / 3  # max 1.0
+
+    return {
+        'primacy': primacy,
+        'recency': recency,
+        'accuracy': accuracy
+    }
+
+
+def metrics_frame(trials, valid, primacy, recency, accuracy):
+    """Per-trial metric arrays -> the DataFrame metrics_dataframe returns (invalid trials score 0)"""
+    return pd.DataFrame({
+        'primacy': np.where(valid, primacy, 0),
+        'recency': np.where(valid, recency, 0),
+        'accuracy': np.where(valid, accuracy, 0),
+        'trial': trials.trial,
+        'condition': trials.condition_names,
+    })
+
+
+def free_recall_metrics(df_test, list_length=15, edge=5):
+    """calculate_free_recall_metrics for all trials at once on their integer encoding"""
+    trials = as_encoded(df_test, list_length)
+    presented, recalled = trials.presented, trials.recalled
+    valid = trials.full & (trials.r_len > 0)
+
+    # Every recalled word counts, repeats included, as in the per-trial version
+    accuracy = occurs_in(recalled, presented).sum(axis=1) / trials.list_length
+    primacy = occurs_in(recalled, presented[:, :edge]).sum(axis=1) / edge
+    recency = occurs_in(recalled, presented[:, -edge:]).sum(axis=1) / edge
+    return metrics_frame(trials, valid, primacy, recency, accuracy)
+
+
+def serial_recall_metrics(df_test, list_length=7, edge=3):
+    """calculate_serial_recall_metrics for all trials at once on their integer encoding"""
+    trials = as_encoded(df_test, list_length)
+    presented = trials.presented
+    valid = trials.full & (trials.r_len > 0)
+    hit = occurs_in(presented, trials.recalled)
+
+    # Set overlap: a letter presented twice counts once
+    accuracy = (hit & first_occurrence(presented)).sum(axis=1) / trials.list_length
+    primacy = (hit[:, :edge] & first_occurrence(presented[:, :edge])).sum(axis=1) / edge
+    recency = (hit[:, -edge:] & first_occurrence(presented[:, -edge:])).sum(axis=1) / edge
+    return metrics_frame(trials, valid, primacy, recency, accuracy)
+
+
+ENCODED_METRICS = {calculate_free_recall_metrics: free_recall_metrics,
+                   calculate_serial_recall_metrics: serial_recall_metrics}
+
+
+def metrics_dataframe(df_test, calculate_metrics):
+    """Apply a calculate_*_metrics function to every trial -> DataFrame with trial, condition and metrics.
+
+    The two calculate_*_metrics functions above run on the integer encoding of all trials at once.
+    """
+    if calculate_metrics in ENCODED_METRICS:
+        return ENCODED_METRICS[calculate_metrics](df_test)
+
+    results = []
+    for _, row in df_test.iterrows():
+        metrics = calculate_metrics(row['presented_words'], row['recalled_words'])
+        metrics['trial'] = row['trial']
+        metrics['condition'] = row['condition']
+        results.append(metrics)
+    return pd.DataFrame(results)
+
+
+# --- Serial Position Curve Analysis (overall + per condition) ---
+def serial_position_analysis(df_test, list_length=15):
+    """Probability that each serial position was recalled, overall and per condition.
+
+    Only trials with a full list and at least one recalled item count. Returns
+    {'overall': [...], 'per_condition': {condition: [...]}}, conditions in order of appearance.
+    """
+    trials = as_encoded(df_test, list_length)
+    L = trials.list_length
+    valid = trials.full & (trials.r_len > 0)
+    hits = occurs_in(trials.presented, trials.recalled) & valid[:, None]
+
+    C = len(trials.conditions)
+    recalls = np.bincount((trials.cond[:, None] * L + np.arange(L)).ravel(), weights=hits.ravel(),
+                          minlength=C * L).reshape(C, L)
+    totals = np.bincount(trials.cond[valid], minlength=C)
+
+    # compute recall probabilities
+    def compute_probs(position_recalls, position_totals):
+        return np.divide(position_recalls, position_totals, out=np.zeros(L),
+                         where=np.broadcast_to(position_totals > 0, (L,))).tolist()
+
+    recall_probs = {
+        "overall": compute_probs(recalls.sum(axis=0), totals.sum()),
+        "per_condition": {trials.conditions[c]: compute_probs(recalls[c], totals[c])
+                          for c in pd.unique(trials.cond)}
+    }
+
+    return recall_probs
+
+
+def letter_confusion_matrix(df_test):
+    """Presented x recalled first-letter counts (diagonal = correctly recalled letters)"""
+    # Create list of all unique letters used
+    all_letters = set()
+    for row in df_test.itertuples():
+        all_letters.update([w[0].upper() for w in row.presented_words])  # first letter uppercase
+    all_letters = sorted(list(all_letters))
+
+    # Initialize confusion matrix
+    confusion_matrix = pd.DataFrame(
+        0, index=all_letters, columns=all_letters
+    )
+
+    # Fill the confusion matrix
+    for row in df_test.itertuples():
+        presented = [w[0].upper() for w in row.presented_words]  # first letter of each word
+        recalled = [w[0].upper() for w in row.recalled_words if w]  # first letter
+        # For each presented letter
+        for p in presented:
+            if p in recalled:
+                # Correct recall: increment diagonal
+                confusion_matrix.loc[p, p] += 1
+            else:
+                # Incorrect recall: assume the letter was confused with one of the recalled letters
+                for r in recalled:
+                    if r in confusion_matrix.columns:
+                        confusion_matrix.loc[p, r] += 1
+
+    return confusion_matrix
+
+
+def compute_ci(data, confidence=0.95):
+    """Return mean and 95% confidence interval."""
+    n = len(data)
+    mean = np.mean(data)
+    sem = stats.sem(data)  # standard error of the mean
+    h = sem * stats.t.ppf((1 + confidence) / 2., n-1)  # margin
+    return mean, mean-h, mean+h
+
+
+def ci_by_condition(results_df, metric='accuracy', confidence=0.95):
+    """{condition: {'mean', 'ci_lower', 'ci_upper'}} for one metric"""
+    ci_results = {}
+    for cond in results_df['condition'].unique():
+        subset = results_df[results_df['condition'] == cond][metric]
+        mean, lower, upper = compute_ci(subset, confidence)
+        ci_results[cond] = {'mean': mean, 'ci_lower': lower, 'ci_upper': upper}
+    return ci_results
+
+
+def kruskal_by_condition(results_df, metric='accuracy'):
+    """Kruskal-Wallis H-test of one metric across all conditions -> (H, p)"""
+    omnibus, _ = compare_conditions(results_df, [metric])
+    return omnibus['h_stat'].iloc[0], omnibus['p_value'].iloc[0]
+
+
+def pairwise_mannwhitney(results_df, metric='accuracy', alpha=0.05):
+    """Two-sided Mann-Whitney U for every pair of conditions with Bonferroni correction"""
+    _, pairwise = compare_conditions(results_df, [metric])
+    rows = pairwise[pairwise['test'] == 'mannwhitney']
+    return [{
+        'comparison': row.comparison,
+        'u_stat': row.statistic,
+        'p_value': row.p_value,
+        'significant': row.p_bonferroni < alpha,
+        'effect_size': row.effect_size,
+        'median_diff': row.median_diff
+    } for row in rows.itertuples()]
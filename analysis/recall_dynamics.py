@@ -0,0 +1,118 @@
+"""Free recall dynamics: lag-CRP, probability of first recall and output-position curves.
+
+All measures start from one output-position matrix: for every trial and output position
+the serial position (0-based) of the word typed there, -1 for intrusions, repeats and
+padding. It is built from the uint16 word ids of trial_encoding, so every step below is an
+array operation over all trials; the only Python loops run over list and output positions.
+"""
+import numpy as np
+import pandas as pd
+
+from trial_encoding import PAD, as_encoded
+
+CHUNK_SIZE = 100_000  # trials matched at a time to keep the (trials, outputs, list) comparison small
+
+
+def output_position_matrix(presented, recalled):
+    """(n, W) serial position of each output (0-based); -1 = intrusion, repeat or padding"""
+    n, width = recalled.shape
+    positions = np.full((n, width), -1, dtype=np.int16)
+    for start in range(0, n, CHUNK_SIZE):
+        p, r = presented[start:start + CHUNK_SIZE], recalled[start:start + CHUNK_SIZE]
+        same = (r[:, :, None] == p[:, None, :]) & (r != PAD)[:, :, None]
+        positions[start:start + CHUNK_SIZE] = np.where(same.any(axis=2), same.argmax(axis=2), -1)
+
+    # Only the first recall of a serial position counts
+    for k in range(1, width):
+        repeat = (positions[:, :k] == positions[:, k:k + 1]).any(axis=1) & (positions[:, k] >= 0)
+        positions[repeat, k] = -1
+    return positions
+
+
+def first_recall_probability(positions, cond, n_conditions, list_length=15):
+    """(conditions, L) probability that the first output is serial position i (trials with no
+    correct first output count in the denominator)"""
+    first = positions[:, 0].astype(np.int64)
+    valid = first >= 0
+    counts = np.bincount(cond[valid] * list_length + first[valid], minlength=n_conditions * list_length)
+    trials = np.bincount(cond, minlength=n_conditions)
+    return counts.reshape(n_conditions, list_length) / np.maximum(trials, 1)[:, None]
+
+
+def lag_crp(positions, cond, n_conditions, list_length=15):
+    """(conditions, 2L-1) lag-conditional response probability for lags -(L-1)..L-1.
+
+    Counts transitions between consecutive correct outputs (transitions into or out of an
+    intrusion/repeat are skipped) and divides by how often each lag was still available.
+    """
+    L = list_length
+    n, width = positions.shape
+    n_lags = 2 * L - 1
+    actual = np.zeros(n_conditions * n_lags, dtype=np.int64)
+    possible = np.zeros(n_conditions * n_lags, dtype=np.int64)
+    recalled = np.zeros((n, L), dtype=bool)
+    rows = np.arange(n)
+    serial = np.arange(L)
+
+    for k in range(width - 1):
+        here = positions[:, k].astype(np.int64)
+        correct = here >= 0
+        recalled[rows[correct], here[correct]] = True
+
+        nxt = positions[:, k + 1].astype(np.int64)
+        step = correct & (nxt >= 0)
+        if not step.any():
+            continue
+        offset = cond[step] * n_lags + L - 1
+        actual += np.bincount(offset + nxt[step] - here[step], minlength=len(actual))
+
+        # Every serial position not yet recalled was an available lag from here
+        available = ~recalled[step]
+        lags = offset[:, None] + serial - here[step][:, None]
+        possible += np.bincount(lags[available], minlength=len(possible))
+
+    crp = np.divide(actual, possible, out=np.full(len(actual), np.nan), where=possible > 0)
+    crp = crp.reshape(n_conditions, n_lags)
+    crp[:, L - 1] = np.nan
+    return crp
+
+
+def output_position_curve(positions, recalled, cond, n_conditions):
+    """(conditions, W) probability that the k-th output was a correct, new list word, and (conditions, W)
+    number of trials that made a k-th output"""
+    width = positions.shape[1]
+    made = recalled != PAD
+    correct = positions >= 0
+    index = (cond[:, None] * width + np.arange(width)).ravel()
+    outputs = np.bincount(index, weights=made.ravel(), minlength=n_conditions * width).reshape(n_conditions, width)
+    hits = np.bincount(index, weights=correct.ravel(), minlength=n_conditions * width).reshape(n_conditions, width)
+    return np.divide(hits, outputs, out=np.full(hits.shape, np.nan), where=outputs > 0), outputs.astype(np.int64)
+
+
+def recall_dynamics(df_test, list_length=15):
+    """Lag-CRP, probability of first recall and output-position curve per condition.
+
+    df_test is a cleaned free recall DataFrame (presented_words / recalled_words lists, the
+    recalled ones in typed order) or its EncodedTrials. Trials without a full list are skipped. Returns
+    {'lag_crp', 'first_recall', 'output_curve', 'output_counts'} DataFrames with one column per condition.
+    """
+    trials = as_encoded(df_test, list_length, letters=False)
+    full = trials.full
+    conditions, cond = np.unique(trials.condition_names[full], return_inverse=True)
+    width = max(int(trials.r_len.max(initial=0)), 1)  # outputs up to the longest recall
+    presented, recalled = trials.presented[full], trials.recalled[full, :width]
+    positions = output_position_matrix(presented, recalled)
+    C = len(conditions)
+
+    lags = pd.Index(range(-(list_length - 1), list_length), name='lag')
+    serial_positions = pd.Index(range(1, list_length + 1), name='serial_position')
+    output_index = pd.Index(range(1, positions.shape[1] + 1), name='output_position')
+    curve, counts = output_position_curve(positions, recalled, cond, C)
+
+    return {
+        'lag_crp': pd.DataFrame(lag_crp(positions, cond, C, list_length).T, index=lags, columns=conditions),
+        'first_recall': pd.DataFrame(first_recall_probability(positions, cond, C, list_length).T,
+                                     index=serial_positions, columns=conditions),
+        'output_curve': pd.DataFrame(curve.T, index=output_index, columns=conditions),
+        'output_counts': pd.DataFrame(counts.T, index=output_index, columns=conditions),
+    }
@@ -0,0 +1,178 @@
+"""Alignment-based serial recall scoring for whole batches of trials.
+
+Position-by-position scoring marks every letter after an omission as wrong. Here each
+recalled sequence is aligned to the presented one with an edit distance that allows
+substitutions, omissions (deletions), intrusions (insertions) and adjacent transpositions,
+all at cost 1. The dynamic programme and its backtrace run over the uint8 letter codes of
+trial_encoding for all trials at once, so the loops only go over list positions.
+
+Per trial, presented letters are either correct (matched in the alignment), transposed
+(recalled, but not in their aligned place) or omitted. Recalled letters that are not
+correct or transposed are intrusions (not presented) or repetitions (extra copies).
+"""
+import numpy as np
+import pandas as pd
+
+from trial_encoding import N_LETTER_CODES, PAD, as_encoded
+
+
+def alignment_table(presented, recalled):
+    """(P+1, R+1, n) edit distance table with adjacent transpositions (optimal string alignment).
+
+    Trials are the last axis so every cell update is one contiguous vector operation.
+    """
+    n, P = presented.shape
+    R = recalled.shape[1]
+    pres, rec = np.ascontiguousarray(presented.T), np.ascontiguousarray(recalled.T)
+    D = np.empty((P + 1, R + 1, n), dtype=np.int16)
+    D[:, 0, :] = np.arange(P + 1)[:, None]
+    D[0, :, :] = np.arange(R + 1)[:, None]
+
+    for i in range(1, P + 1):
+        p = pres[i - 1]
+        for j in range(1, R + 1):
+            r = rec[j - 1]
+            cell = D[i, j]
+            np.minimum(D[i - 1, j], D[i, j - 1], out=cell)
+            cell += 1
+            np.minimum(cell, D[i - 1, j - 1] + (p != r), out=cell)
+            if i > 1 and j > 1:
+                swapped = (p == rec[j - 2]) & (pres[i - 2] == r) & (p != r)
+                np.minimum(cell, np.where(swapped, D[i - 2, j - 2] + 1, cell), out=cell)
+    return D
+
+
+def backtrace(D, presented, recalled, p_len, r_len):
+    """Walk every trial's table back from (p_len, r_len) at once.
+
+    Returns (matched, op_counts): matched is (n, P) bool for presented positions aligned to an
+    identical recalled letter; op_counts holds per-trial substitutions, deletions, insertions
+    and adjacent swaps.
+    """
+    n, P = presented.shape
+    i, j = p_len.copy(), r_len.copy()
+    matched = np.zeros((n, P), dtype=bool)
+    counts = {op: np.zeros(n, dtype=np.int64) for op in ('substitutions', 'deletions', 'insertions', 'swaps')}
+
+    # Letter at column k of the walking trials (k = -1 is clipped; those trials are masked out)
+    def letter(codes, rows, k):
+        return codes[rows, np.clip(k, 0, codes.shape[1] - 1)]
+
+    active = (i > 0) | (j > 0)
+    while active.any():
+        # Only trials still walking take part in this step
+        rows = np.flatnonzero(active)
+        ii, jj = i[rows], j[rows]
+        here = D[ii, jj, rows]
+        diag = D[np.maximum(ii - 1, 0), np.maximum(jj - 1, 0), rows]
+        up = D[np.maximum(ii - 1, 0), jj, rows]
+        p1, r1 = letter(presented, rows, ii - 1), letter(recalled, rows, jj - 1)
+
+        # Preference order: match, swap, substitution, deletion (omission), insertion (intrusion)
+        can_diag = (ii > 0) & (jj > 0)
+        is_match = can_diag & (p1 == r1) & (here == diag)
+        is_swap = (can_diag & ~is_match & (ii > 1) & (jj > 1) & (p1 != r1)
+                   & (p1 == letter(recalled, rows, jj - 2)) & (letter(presented, rows, ii - 2) == r1)
+                   & (here == D[np.maximum(ii - 2, 0), np.maximum(jj - 2, 0), rows] + 1))
+        is_sub = can_diag & ~is_match & ~is_swap & (here == diag + 1)
+        is_del = ~is_match & ~is_swap & ~is_sub & (ii > 0) & (here == up + 1)
+        is_ins = ~is_match & ~is_swap & ~is_sub & ~is_del
+
+        matched[rows[is_match], ii[is_match] - 1] = True
+        counts['swaps'][rows] += is_swap
+        counts['substitutions'][rows] += is_sub
+        counts['deletions'][rows] += is_del
+        counts['insertions'][rows] += is_ins
+
+        i[rows] = ii - np.where(is_swap, 2, is_match | is_sub | is_del)
+        j[rows] = jj - np.where(is_swap, 2, is_match | is_sub | is_ins)
+        active = (i > 0) | (j > 0)
+    return matched, counts
+
+
+def letter_counts(codes):
+    """(n, N_LETTER_CODES) occurrences of every letter code per trial (column 0 = padding)"""
+    n, width = codes.shape
+    flat = (np.arange(n)[:, None] * N_LETTER_CODES + codes).ravel()
+    return np.bincount(flat, minlength=n * N_LETTER_CODES).reshape(n, N_LETTER_CODES)
+
+
+def score_encoded(presented, recalled, p_len, r_len):
+    """Score encoded trials -> dict of per-trial arrays plus the (n, P) matched-position mask"""
+    D = alignment_table(presented, recalled)
+    matched, ops = backtrace(D, presented, recalled, p_len, r_len)
+
+    pc, rc = letter_counts(presented)[:, 1:], letter_counts(recalled)[:, 1:]
+    items_recalled = np.minimum(pc, rc).sum(axis=1)
+    correct = matched.sum(axis=1)
+    w = min(presented.shape[1], recalled.shape[1])
+    strict = ((presented[:, :w] == recalled[:, :w]) & (presented[:, :w] != PAD)).sum(axis=1)
+
+    return {
+        'list_length': p_len,
+        'recall_length': r_len,
+        'correct': correct,
+        'transpositions': items_recalled - correct,
+        'omissions': p_len - items_recalled,
+        'intrusions': (rc * (pc == 0)).sum(axis=1),
+        'repetitions': (np.maximum(rc - pc, 0) * (pc > 0)).sum(axis=1),
+        'adjacent_swaps': ops['swaps'],
+        'edit_distance': D[p_len, r_len, np.arange(len(p_len))].astype(np.int64),
+        'strict_correct': strict,
+        'matched': matched,
+    }
+
+
+def score_serial_recall(df_test, list_length=7):
+    """Alignment-based scores for every trial of a cleaned serial recall DataFrame.
+
+    df_test may also be its EncodedTrials (letter codes). Returns one row per trial with
+    trial, condition, the error-type counts and aligned_accuracy / strict_accuracy
+    (position-by-position, as the scripts print it).
+    """
+    trials = as_encoded(df_test, list_length, letters=True)
+    p_len = trials.presented_mask.sum(axis=1)
+    scores = score_encoded(trials.presented, trials.recalled, p_len, trials.r_len)
+    scores.pop('matched')
+
+    result = pd.DataFrame({'trial': trials.trial, 'condition': trials.condition_names, **scores})
+    result['aligned_accuracy'] = result['correct'] / list_length
+    result['strict_accuracy'] = result['strict_correct'] / list_length
+    return result
+
+
+def output_positions(presented, recalled):
+    """(n, P) output position (0-based) at which each presented letter was first typed, -1 = omitted"""
+    same = (presented[:, :, None] == recalled[:, None, :]) & (presented != PAD)[:, :, None]
+    return np.where(same.any(axis=2), same.argmax(axis=2), -1)
+
+
+def transposition_matrices(df_test, list_length=7, normalize=True):
+    """Presented position x output position matrix for every condition.
+
+    Columns are output positions 1..list_length (typed later than list_length counts as the
+    last column) plus 'omitted'. The diagonal holds letters recalled in place; mass next to
+    it is the transposition gradient. With normalize=True each row is a proportion of the
+    trials. Returns {condition: DataFrame}.
+    """
+    trials = as_encoded(df_test, list_length, letters=True)
+    presented, conditions, cond = trials.presented, trials.conditions, trials.cond
+
+    L = list_length
+    out = output_positions(presented, trials.recalled)
+    column = np.where(out < 0, L, np.minimum(out, L - 1))  # omitted -> last column
+    cells = L * (L + 1)
+    flat = cond[:, None] * cells + np.arange(L) * (L + 1) + column
+    flat = flat[presented != PAD]
+    counts = np.bincount(flat, minlength=len(conditions) * cells).reshape(len(conditions), L, L + 1)
+
+    index = pd.Index(range(1, L + 1), name='presented_position')
+    columns = pd.Index(list(range(1, L + 1)) + ['omitted'], name='output_position')
+    matrices = {}
+    for c, name in enumerate(conditions):
+        matrix = counts[c]
+        if normalize:
+            totals = matrix.sum(axis=1, keepdims=True)
+            matrix = np.divide(matrix, totals, out=np.zeros(matrix.shape), where=totals > 0)
+        matrices[name] = pd.DataFrame(matrix, index=index, columns=columns)
+    return matrices
@@ -0,0 +1,293 @@
+"""Vectorized synthetic free/serial recall datasets with a primacy/recency recall model.
+
+Recall probability at serial position i (1..L) is
+
+    p(i) = baseline + primacy * exp(-(i - 1) / primacy_decay) + recency * exp(-(L - i) / recency_decay)
+
+clipped to [0, 1]. Free recall adds extra-list intrusions and an output order that tends
+to start at the end of the list; serial recall adds adjacent transpositions. Serial lists are
+drawn as the experiment scripts draw them: consonants under the LetterConstraints rules, and
+whole chunks from ChunkComposer in the chunking condition, where letters can repeat. The
+ground-truth parameters are written next to the CSV so analysis results can be checked against them.
+
+Usage (from the project root):
+    python analysis/synthetic_data.py free 1000000 Experiment_Output/synthetic_free_recall.csv
+    python analysis/synthetic_data.py serial 100000000 Experiment_Output/synthetic_serial.store
+
+A path not ending in .csv is written as a memory-mapped trial store (see trial_store.py),
+simulated chunk by chunk, so the dataset never has to fit in RAM.
+"""
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from trial_encoding import PAD, EncodedTrials, letter_codes, word_codes, word_ids
+from trial_store import TrialStore
+
+this_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(this_dir)
+sys.path.insert(0, os.path.join(project_root, 'Serial Recall'))  # the letter generators of the experiments
+
+from chunk_composer import ChunkComposer
+from letter_generator import LetterConstraints, load_acronyms
+
+WORDS_CSV_PATH = os.path.join(project_root, 'Data', 'memory_nouns_4plus.csv')
+CHUNKS_CSV_PATH = os.path.join(project_root, 'Data', 'short_words_chunks.csv')
+LETTERS = np.array([chr(c) for c in range(ord('A'), ord('Z') + 1)])
+
+FREE_LIST_LENGTH = 15
+SERIAL_LIST_LENGTH = 7
+
+# Ground-truth model parameters per condition
+FREE_RECALL_PARAMS = {
+    'normal': {'baseline': 0.30, 'primacy': 0.35, 'primacy_decay': 1.5, 'recency': 0.45, 'recency_decay': 1.5,
+               'intrusion_rate': 0.30, 'recency_start': 2.0},
+    'fast':   {'baseline': 0.20, 'primacy': 0.30, 'primacy_decay': 1.2, 'recency': 0.45, 'recency_decay': 1.5,
+               'intrusion_rate': 0.40, 'recency_start': 2.0},
+    'break':  {'baseline': 0.28, 'primacy': 0.35, 'primacy_decay': 1.5, 'recency': 0.15, 'recency_decay': 1.5,
+               'intrusion_rate': 0.35, 'recency_start': 0.5},
+    'math':   {'baseline': 0.27, 'primacy': 0.33, 'primacy_decay': 1.5, 'recency': 0.05, 'recency_decay': 1.5,
+               'intrusion_rate': 0.35, 'recency_start': 0.0},
+}
+
+SERIAL_RECALL_PARAMS = {
+    'normal':      {'baseline': 0.75, 'primacy': 0.20, 'primacy_decay': 1.5, 'recency': 0.10, 'recency_decay': 0.8,
+                    'transposition_rate': 0.08},
+    'chunking':    {'baseline': 0.85, 'primacy': 0.12, 'primacy_decay': 1.5, 'recency': 0.08, 'recency_decay': 0.8,
+                    'transposition_rate': 0.04},
+    'suppression': {'baseline': 0.55, 'primacy': 0.25, 'primacy_decay': 1.5, 'recency': 0.15, 'recency_decay': 0.8,
+                    'transposition_rate': 0.12},
+    'tapping':     {'baseline': 0.70, 'primacy': 0.20, 'primacy_decay': 1.5, 'recency': 0.10, 'recency_decay': 0.8,
+                    'transposition_rate': 0.09},
+}
+
+CHUNK_SIZE = 200_000  # trials generated per batch to keep the random matrices small
+
+
+def load_vocabulary(csv_path=WORDS_CSV_PATH):
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        return np.array([line.strip() for line in f if line.strip()])
+
+
+def recall_curve(params, list_length):
+    """Recall probability per serial position for one condition"""
+    pos = np.arange(1, list_length + 1)
+    p = (params['baseline']
+         + params['primacy'] * np.exp(-(pos - 1) / params['primacy_decay'])
+         + params['recency'] * np.exp(-(list_length - pos) / params['recency_decay']))
+    return np.clip(p, 0, 1)
+
+
+def sample_without_replacement(rng, n, pool_size, k):
+    """(n, k) item indices, distinct within each row"""
+    if 4 * k > pool_size:
+        return np.argpartition(rng.random((n, pool_size)), k, axis=1)[:, :k]
+
+    # Small k: draw with replacement and redraw only the entries that repeat an earlier column
+    items = rng.integers(0, pool_size, (n, k))
+    for j in range(1, k):
+        rows = np.flatnonzero((items[:, :j] == items[:, j:j + 1]).any(axis=1))
+        while rows.size:
+            items[rows, j] = rng.integers(0, pool_size, rows.size)
+            rows = rows[(items[rows, :j] == items[rows, j:j + 1]).any(axis=1)]
+    return items
+
+
+def condition_codes(n, conditions, rng):
+    """Balanced condition assignment in random order"""
+    codes = np.arange(n) % len(conditions)
+    rng.shuffle(codes)
+    return codes
+
+
+def simulate_free_recall(n, params=FREE_RECALL_PARAMS, vocabulary=None, seed=0):
+    """Simulate n free recall trials.
+
+    Returns a dict of arrays: presented (n, 15) vocabulary indices, recalled (n, 15) bool,
+    output_order (n, 15) serial positions in recall order (-1 = padding), intrusions (n,)
+    vocabulary index of one extra-list intrusion (-1 = none) and condition (n,) codes.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = load_vocabulary() if vocabulary is None else vocabulary
+    conditions = list(params)
+    L = FREE_LIST_LENGTH
+    curves = np.array([recall_curve(params[c], L) for c in conditions])
+    recency_start = np.array([params[c]['recency_start'] for c in conditions])
+    intrusion_rate = np.array([params[c]['intrusion_rate'] for c in conditions])
+
+    parts = []
+    for start in range(0, n, CHUNK_SIZE):
+        m = min(CHUNK_SIZE, n - start)
+        cond = condition_codes(m, conditions, rng)
+        presented = sample_without_replacement(rng, m, len(vocabulary), L)
+        recalled = rng.random((m, L)) < curves[cond]
+
+        # Output order: recalled items sorted by a noisy key that favours late positions when recency_start > 0
+        key = rng.gumbel(size=(m, L)) + recency_start[cond][:, None] * np.arange(L) / (L - 1)
+        key[~recalled] = -np.inf
+        order = np.argsort(-key, axis=1)
+        output_order = np.where(np.take_along_axis(recalled, order, axis=1), order, -1)
+
+        # One possible extra-list intrusion per trial (a vocabulary word not in the list)
+        intrusion = rng.integers(0, len(vocabulary), m)
+        in_list = (presented == intrusion[:, None]).any(axis=1)
+        intrusion = np.where((rng.random(m) < intrusion_rate[cond]) & ~in_list, intrusion, -1)
+
+        parts.append((presented, recalled, output_order, intrusion, cond))
+
+    presented, recalled, output_order, intrusion, cond = (np.concatenate(arrays) for arrays in zip(*parts))
+    return {'presented': presented, 'recalled': recalled, 'output_order': output_order,
+            'intrusions': intrusion, 'condition': cond, 'conditions': conditions,
+            'vocabulary': vocabulary, 'params': params, 'seed': seed}
+
+
+def simulate_serial_recall(n, params=SERIAL_RECALL_PARAMS, seed=0):
+    """Simulate n serial recall trials.
+
+    Returns presented (n, 7) letter indices, recalled (n, 7) bool per presented position,
+    output_order (n, 7) presented positions in typed order (-1 = padding) and condition (n,) codes.
+    Adjacent recalled items swap places with the condition's transposition rate.
+    """
+    rng = np.random.default_rng(seed)
+    conditions = list(params)
+    L = SERIAL_LIST_LENGTH
+    acronyms = load_acronyms(CHUNKS_CSV_PATH)
+    letter_constraints = LetterConstraints(acronyms)
+    chunk_composer = ChunkComposer(acronyms, target_length=L)
+    chunking = conditions.index('chunking') if 'chunking' in conditions else -1
+    curves = np.array([recall_curve(params[c], L) for c in conditions])
+    transposition_rate = np.array([params[c]['transposition_rate'] for c in conditions])
+
+    parts = []
+    for start in range(0, n, CHUNK_SIZE):
+        m = min(CHUNK_SIZE, n - start)
+        cond = condition_codes(m, conditions, rng)
+        presented = letter_constraints.generate_batch(m, L, seed=rng).astype(np.intp)
+        chunked = cond == chunking
+        presented[chunked] = chunk_composer.generate_batch(int(chunked.sum()), seed=rng)
+        recalled = rng.random((m, L)) < curves[cond]
+
+        # Omitted letters are simply not typed, so compact recalled positions to the left
+        order = np.argsort(~recalled, axis=1, kind='stable')
+        output_order = np.where(np.take_along_axis(recalled, order, axis=1), order, -1)
+
+        # Adjacent transpositions in the typed sequence
+        for k in range(L - 1):
+            both = (output_order[:, k] >= 0) & (output_order[:, k + 1] >= 0)
+            swap = both & (rng.random(m) < transposition_rate[cond])
+            output_order[swap, k], output_order[swap, k + 1] = output_order[swap, k + 1], output_order[swap, k]
+
+        parts.append((presented, recalled, output_order, cond))
+
+    presented, recalled, output_order, cond = (np.concatenate(arrays) for arrays in zip(*parts))
+    return {'presented': presented, 'recalled': recalled, 'output_order': output_order,
+            'condition': cond, 'conditions': conditions, 'vocabulary': LETTERS,
+            'params': params, 'seed': seed}
+
+
+def recalled_items(sim):
+    """Per trial list of recalled items in output order (free recall intrusions appended last)"""
+    vocabulary = sim['vocabulary']
+    presented = sim['presented']
+    order = sim['output_order']
+    valid = order >= 0
+    items = vocabulary[np.take_along_axis(presented, np.where(valid, order, 0), axis=1)]
+    lengths = valid.sum(axis=1)
+    rows = [list(row[:k]) for row, k in zip(items.tolist(), lengths.tolist())]
+    if 'intrusions' in sim:
+        for i in np.flatnonzero(sim['intrusions'] >= 0).tolist():
+            rows[i].append(vocabulary[sim['intrusions'][i]])
+    return rows
+
+
+def to_dataframe(sim):
+    """Cleaned-format DataFrame (lowercase lists), like the notebooks work with after clean_word_list"""
+    presented = np.char.lower(sim['vocabulary'][sim['presented']]).tolist()
+    recalled = [[w.lower() for w in row] for row in recalled_items(sim)]
+    return pd.DataFrame({
+        'trial': np.arange(1, len(presented) + 1),
+        'condition': np.array(sim['conditions'])[sim['condition']],
+        'presented_words': presented,
+        'recalled_words': recalled,
+    })
+
+
+def to_encoded(sim, ids=None):
+    """EncodedTrials straight from the simulation arrays, without building string lists"""
+    vocabulary = sim['vocabulary']
+    free = 'intrusions' in sim
+    codes = word_codes(vocabulary, word_ids() if ids is None else ids) if free else letter_codes(vocabulary)
+    presented = codes[sim['presented']]
+    order = sim['output_order']
+    valid = order >= 0
+    recalled = np.where(valid, np.take_along_axis(presented, np.where(valid, order, 0), axis=1), PAD)
+    recalled = recalled.astype(codes.dtype)
+    r_len = valid.sum(axis=1)
+
+    if free:
+        # The intrusion is typed after the recalled list words
+        recalled = np.pad(recalled, ((0, 0), (0, 1)))
+        rows = np.flatnonzero(sim['intrusions'] >= 0)
+        recalled[rows, r_len[rows]] = codes[sim['intrusions'][rows]]
+        r_len[rows] += 1
+
+    n, L = presented.shape
+    return EncodedTrials(presented, recalled, np.full(n, L, dtype=np.int16), r_len.astype(np.int16),
+                         sim['condition'].astype(np.intp), np.array(sim['conditions'], dtype=object),
+                         np.arange(1, n + 1), L)
+
+
+def write_store(kind, n, path, seed=0):
+    """Simulate n trials into a new trial store, CHUNK_SIZE trials at a time"""
+    free = kind == 'free'
+    simulate = simulate_free_recall if free else simulate_serial_recall
+    store = TrialStore.create(path, 'words' if free else 'letters', FREE_LIST_LENGTH if free else SERIAL_LIST_LENGTH)
+    for k, start in enumerate(range(0, n, CHUNK_SIZE)):
+        sim = simulate(min(CHUNK_SIZE, n - start), seed=[seed, k])
+        trials = to_encoded(sim, store.ids)
+        trials.trial += start
+        store.append(trials)
+
+    with open(os.path.join(path, 'params.json'), 'w', encoding='utf-8') as f:
+        json.dump({'n_trials': n, 'seed': seed, 'params': sim['params']}, f, indent=2)
+    return store
+
+
+def write_csv(sim, csv_file):
+    """Write in the raw results format ([a, b, c] lists) plus a .params.json with the ground truth"""
+    presented = sim['vocabulary'][sim['presented']].tolist()
+    recalled = recalled_items(sim)
+    conditions = np.array(sim['conditions'])[sim['condition']].tolist()
+
+    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['trial', ' condition', ' presented_words', ' recalled_words'])
+        writer.writerows([i, cond, "[" + ", ".join(p) + "]", "[" + ", ".join(r) + "]"]
+                         for i, (cond, p, r) in enumerate(zip(conditions, presented, recalled), start=1))
+
+    with open(os.path.splitext(csv_file)[0] + '.params.json', 'w', encoding='utf-8') as f:
+        json.dump({'n_trials': len(conditions), 'seed': sim['seed'], 'params': sim['params']}, f, indent=2)
+
+
+def main():
+    if len(sys.argv) < 4 or sys.argv[1] not in ('free', 'serial'):
+        print(__doc__)
+        return 1
+    kind, n, csv_file = sys.argv[1], int(float(sys.argv[2])), sys.argv[3]
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    if not csv_file.endswith('.csv'):
+        write_store(kind, n, csv_file, seed)
+        print(f"Wrote {n} simulated {kind} recall trials to the trial store {csv_file}")
+        return 0
+    sim = simulate_free_recall(n, seed=seed) if kind == 'free' else simulate_serial_recall(n, seed=seed)
+    write_csv(sim, csv_file)
+    print(f"Wrote {n} simulated {kind} recall trials to {csv_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
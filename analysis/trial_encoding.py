@@ -0,0 +1,212 @@
+"""Compact integer encoding of cleaned trials.
+
+The cleaned DataFrames hold every trial as Python lists of strings in object columns.
+Here a batch of trials becomes fixed-width integer arrays instead: free recall words are
+uint16 ids from the Data/memory_nouns_4plus.csv vocabulary, serial recall letters uint8
+codes (A=1..Z=26). Both are padded with PAD (0), so `codes != PAD` is the padding mask
+and every comparison between items is an integer comparison over all trials at once.
+
+Words outside the vocabulary (intrusions, typos) get ids after the vocabulary in order of
+first appearance, so they are only comparable within one encoded batch.
+"""
+import csv
+import os
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+this_dir = os.path.dirname(os.path.abspath(__file__))
+VOCABULARY_PATH = os.path.join(os.path.dirname(this_dir), 'Data', 'memory_nouns_4plus.csv')
+
+PAD = 0                # padding code (also used for empty items, which are dropped)
+OTHER_LETTER = 27      # anything typed in serial recall that is not a single letter A-Z
+N_LETTER_CODES = 28
+MAX_WORD_ID = np.iinfo(np.uint16).max
+
+CHUNK_SIZE = 100_000  # trials compared at a time in occurs_in
+
+
+@lru_cache(maxsize=None)
+def load_vocabulary(path=VOCABULARY_PATH):
+    """Words of the stimulus file, lowercased, in file order (word i + 1 gets id i + 1)"""
+    words = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            word = row[0].strip().lower() if row else ''
+            if word and word not in words:
+                words.append(word)
+    return tuple(words)
+
+
+def word_ids(vocabulary=None):
+    """word -> id for the vocabulary; word_codes adds unknown words to it"""
+    vocabulary = load_vocabulary() if vocabulary is None else vocabulary
+    return {word: i + 1 for i, word in enumerate(vocabulary)}
+
+
+def word_codes(uniques, ids):
+    """Distinct raw words -> uint16 ids (unknown words get the next free id)"""
+    words = pd.Series(uniques, dtype=object).astype(str).str.strip().str.lower()
+    codes = np.zeros(len(words), dtype=np.int64)
+    for i, word in enumerate(words):
+        if word:
+            codes[i] = ids.setdefault(word, len(ids) + 1)
+    if len(ids) > MAX_WORD_ID:
+        raise ValueError(f"{len(ids)} distinct words do not fit in uint16 ids")
+    return codes.astype(np.uint16)
+
+
+def letter_codes(uniques):
+    """Distinct raw items -> uint8 letter codes (A=1..Z=26, OTHER_LETTER for anything else)"""
+    items = pd.Series(uniques, dtype=object).astype(str).str.strip().str.upper()
+    codes = np.full(len(items), OTHER_LETTER, dtype=np.uint8)
+    for i, item in enumerate(items):
+        if not item:
+            codes[i] = PAD
+        elif len(item) == 1 and 'A' <= item <= 'Z':
+            codes[i] = ord(item) - ord('A') + 1
+    return codes
+
+
+def encode_lists(lists, to_codes, width=None, dtype=np.uint16):
+    """Lists of items -> ((n, width) codes padded with PAD, number of items per list).
+
+    to_codes maps the distinct raw items to codes, so each spelling is converted once.
+    Lists longer than width are cut (the returned lengths are not).
+    """
+    lists = list(lists)
+    n = len(lists)
+    lengths = np.array([len(items) for items in lists], dtype=np.int64)
+    flat = np.array(list(chain.from_iterable(lists)), dtype=object)
+    raw, uniques = pd.factorize(flat)
+    codes = to_codes(uniques)[raw] if len(flat) else np.zeros(0, dtype=dtype)
+
+    # Empty items are dropped, so the codes of a list are always contiguous from column 0
+    keep = codes != PAD
+    rows = np.repeat(np.arange(n), lengths)[keep]
+    codes = codes[keep]
+    lengths = np.bincount(rows, minlength=n)
+
+    width = width or max(int(lengths.max(initial=0)), 1)
+    cols = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    inside = cols < width
+    out = np.zeros((n, width), dtype=dtype)
+    out[rows[inside], cols[inside]] = codes[inside]
+    return out, lengths
+
+
+def encode_words(lists, width=None, ids=None):
+    """Lists of words -> ((n, width) uint16 ids, lengths). Pass the same ids dict
+    (see word_ids) to encode several batches with comparable ids."""
+    ids = word_ids() if ids is None else ids
+    return encode_lists(lists, lambda uniques: word_codes(uniques, ids), width, np.uint16)
+
+
+def encode_letters(sequences, width=None):
+    """Lists (or strings) of letters -> ((n, width) uint8 codes, lengths)"""
+    return encode_lists(sequences, letter_codes, width, np.uint8)
+
+
+def is_letter_data(lists, sample=1000):
+    """True when the first lists contain only single letters (serial recall)"""
+    items = pd.unique(np.array(list(chain.from_iterable(list(lists)[:sample])), dtype=object))
+    return len(items) > 0 and all(len(str(item).strip()) == 1 and str(item).strip().isalpha() for item in items)
+
+
+class EncodedTrials:
+    """A batch of trials as fixed-width integer arrays.
+
+    presented is (n, list_length); recalled is (n, width) with width = list_length, or the
+    longest recall if someone typed more items than were shown. p_len / r_len count the items
+    of every list, cond indexes the conditions array and trial holds the trial numbers.
+    """
+
+    def __init__(self, presented, recalled, p_len, r_len, cond, conditions, trial, list_length):
+        self.presented = presented
+        self.recalled = recalled
+        self.p_len = p_len
+        self.r_len = r_len
+        self.cond = cond
+        self.conditions = conditions
+        self.trial = trial
+        self.list_length = list_length
+
+    def __len__(self):
+        return len(self.presented)
+
+    @property
+    def presented_mask(self):
+        return self.presented != PAD
+
+    @property
+    def recalled_mask(self):
+        return self.recalled != PAD
+
+    @property
+    def full(self):
+        """Trials that were shown exactly list_length items"""
+        return self.p_len == self.list_length
+
+    @property
+    def condition_names(self):
+        return self.conditions[self.cond]
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.presented, self.recalled, self.p_len, self.r_len, self.cond, self.trial))
+
+    def take(self, rows):
+        """Subset of the trials (boolean mask or indices); the condition list is kept"""
+        return EncodedTrials(self.presented[rows], self.recalled[rows], self.p_len[rows], self.r_len[rows],
+                             self.cond[rows], self.conditions, self.trial[rows], self.list_length)
+
+
+def encode_trials(df_test, list_length, letters=None, ids=None):
+    """Cleaned DataFrame (presented_words / recalled_words lists) -> EncodedTrials.
+
+    letters=None picks uint8 letter codes when the presented items are single letters and
+    uint16 word ids otherwise. ids is the word -> id dict to use (and extend); by default a
+    fresh one for the stimulus vocabulary.
+    """
+    if letters is None:
+        letters = is_letter_data(df_test['presented_words'])
+    if letters:
+        presented, p_len = encode_letters(df_test['presented_words'], width=list_length)
+        recalled, r_len = encode_letters(df_test['recalled_words'])
+    else:
+        ids = word_ids() if ids is None else ids
+        presented, p_len = encode_words(df_test['presented_words'], list_length, ids)
+        recalled, r_len = encode_words(df_test['recalled_words'], ids=ids)
+
+    if recalled.shape[1] < list_length:
+        recalled = np.pad(recalled, ((0, 0), (0, list_length - recalled.shape[1])))
+    conditions, cond = np.unique(df_test['condition'].values, return_inverse=True)
+    return EncodedTrials(presented, recalled, p_len.astype(np.int16), r_len.astype(np.int16), cond, conditions,
+                         df_test['trial'].values, list_length)
+
+
+def as_encoded(trials, list_length, letters=None):
+    """Pass EncodedTrials through, encode a cleaned DataFrame"""
+    if isinstance(trials, EncodedTrials):
+        return trials
+    return encode_trials(trials, list_length, letters)
+
+
+# --- Comparisons on encoded trials ---
+def occurs_in(items, pool):
+    """(n, A) bool: items[:, a] is not padding and occurs in the same trial's pool"""
+    found = np.zeros(items.shape, dtype=bool)
+    for start in range(0, len(items), CHUNK_SIZE):
+        a, b = items[start:start + CHUNK_SIZE], pool[start:start + CHUNK_SIZE]
+        found[start:start + CHUNK_SIZE] = (a[:, :, None] == b[:, None, :]).any(axis=2)
+    return found & (items != PAD)
+
+
+def first_occurrence(codes):
+    """(n, W) bool: the item is not padding and did not occur earlier in its row"""
+    first = codes != PAD
+    for k in range(1, codes.shape[1]):
+        first[:, k] &= ~(codes[:, :k] == codes[:, k:k + 1]).any(axis=1)
+    return first
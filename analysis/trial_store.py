@@ -0,0 +1,236 @@
+"""Memory-mapped trial store for simulation-scale and pooled datasets.
+
+A store is a directory of raw column files plus a schema header:
+
+    header.json     kind (words/letters), list_length, recall_width, column dtypes, conditions,
+                    the word list behind the ids (words stores) and n_trials
+    presented.bin   (n, list_length) item codes as in trial_encoding, 0 = padding
+    recalled.bin    (n, recall_width) item codes in output order
+    p_len.bin, r_len.bin, cond.bin, trial.bin, timestamp.bin    one value per trial
+
+append() adds rows to the end of every column file and then replaces header.json, so
+n_trials only ever covers complete rows (bytes past it, left by an interrupted append, are
+cut off by the next one). There should be one writer at a time.
+
+Reading maps the files with np.memmap: store[a:b] is an EncodedTrials whose item arrays are
+views of the files, so the analysis functions that take EncodedTrials run on any slice without
+loading the rest. Worker processes that open the same store share its pages through the OS
+page cache instead of each holding a copy; map_chunks() runs a function over all chunks that way.
+
+Usage (from the project root):
+    python analysis/synthetic_data.py free 100000000 Experiment_Output/synthetic_free.store
+    python analysis/trial_store.py Experiment_Output/synthetic_free.store     # print the schema
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from trial_encoding import EncodedTrials, encode_trials, load_vocabulary, word_ids
+
+HEADER_NAME = 'header.json'
+FORMAT_VERSION = 1
+CHUNK_SIZE = 1_000_000  # trials per slice in chunks() / map_chunks()
+
+# Column -> dtype; presented/recalled depend on the kind of store
+ITEM_DTYPES = {'words': 'uint16', 'letters': 'uint8'}
+COLUMN_DTYPES = {'p_len': 'int16', 'r_len': 'int16', 'cond': 'int16', 'trial': 'int64', 'timestamp': 'float64'}
+
+
+def save_header(path, header):
+    tmp_file = os.path.join(path, HEADER_NAME + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_file, os.path.join(path, HEADER_NAME))
+
+
+class TrialStore:
+    """Append-only, memory-mapped store of encoded trials (see the module docstring)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.maps = {}
+        self.refresh()
+
+    @classmethod
+    def create(cls, path, kind, list_length, recall_width=None, conditions=(), vocabulary=None):
+        """New empty store. kind is 'words' (uint16 ids) or 'letters' (uint8 codes); recalled
+        lists longer than recall_width (default twice the list length) are cut to it."""
+        if kind not in ITEM_DTYPES:
+            raise ValueError(f"kind must be one of {sorted(ITEM_DTYPES)}, not {kind!r}")
+        if os.path.exists(os.path.join(path, HEADER_NAME)):
+            raise FileExistsError(f"{path} already holds a trial store")
+        os.makedirs(path, exist_ok=True)
+
+        dtypes = {'presented': ITEM_DTYPES[kind], 'recalled': ITEM_DTYPES[kind], **COLUMN_DTYPES}
+        header = {
+            'format_version': FORMAT_VERSION,
+            'kind': kind,
+            'list_length': list_length,
+            'recall_width': recall_width or 2 * list_length,
+            'dtypes': dtypes,
+            'conditions': list(conditions),
+            'words': list(load_vocabulary() if vocabulary is None else vocabulary) if kind == 'words' else None,
+            'n_trials': 0,
+        }
+        for name in dtypes:
+            open(os.path.join(path, name + '.bin'), 'wb').close()
+        save_header(path, header)
+        return cls(path)
+
+    def refresh(self):
+        """Re-read the header, e.g. to see trials another process appended since"""
+        with open(os.path.join(self.path, HEADER_NAME), 'r', encoding='utf-8') as f:
+            self.header = json.load(f)
+        if self.header.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: unsupported store format {self.header.get('format_version')}")
+        self.ids = word_ids(self.header['words']) if self.header['kind'] == 'words' else None
+        self.maps.clear()
+
+    def __len__(self):
+        return self.header['n_trials']
+
+    @property
+    def list_length(self):
+        return self.header['list_length']
+
+    @property
+    def conditions(self):
+        return np.array(self.header['conditions'], dtype=object)
+
+    def width(self, name):
+        return {'presented': self.list_length, 'recalled': self.header['recall_width']}.get(name)
+
+    def column(self, name):
+        """Read-only memmap of a whole column (only the committed rows)"""
+        if name not in self.maps:
+            n, width, dtype = len(self), self.width(name), np.dtype(self.header['dtypes'][name])
+            shape = (n, width) if width else (n,)
+            if n == 0:
+                self.maps[name] = np.zeros(shape, dtype=dtype)  # np.memmap cannot map an empty file
+            else:
+                self.maps[name] = np.memmap(os.path.join(self.path, name + '.bin'), dtype=dtype, mode='r', shape=shape)
+        return self.maps[name]
+
+    def __getitem__(self, rows):
+        """EncodedTrials for a slice (views of the files) or an index array / mask (copied)"""
+        col = self.column
+        return EncodedTrials(col('presented')[rows], col('recalled')[rows], col('p_len')[rows], col('r_len')[rows],
+                             np.asarray(col('cond')[rows], dtype=np.intp), self.conditions, col('trial')[rows],
+                             self.list_length)
+
+    def timestamps(self, rows=slice(None)):
+        return self.column('timestamp')[rows]
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """(start, EncodedTrials) for consecutive slices of chunk_size trials"""
+        for start in range(0, len(self), chunk_size):
+            yield start, self[start:start + chunk_size]
+
+    # --- Writing ---
+    def encode(self, df_test):
+        """Encode a cleaned DataFrame with this store's word ids (new words are added to them)"""
+        return encode_trials(df_test, self.list_length, letters=self.header['kind'] == 'letters', ids=self.ids)
+
+    def append(self, trials, timestamps=None):
+        """Append a cleaned DataFrame or EncodedTrials (from encode(), or letter codes) -> number of trials.
+
+        timestamps (seconds since the epoch) default to the DataFrame's timestamp column, if any,
+        or to now.
+        """
+        if isinstance(trials, pd.DataFrame):
+            if timestamps is None and 'timestamp' in trials:
+                timestamps = pd.to_datetime(trials['timestamp']).values.astype('datetime64[ns]').astype(np.int64) / 1e9
+            trials = self.encode(trials)
+        n = len(trials)
+        if n == 0:
+            return 0
+        if trials.presented.shape[1] != self.list_length:
+            raise ValueError(f"presented lists are {trials.presented.shape[1]} wide, the store holds {self.list_length}")
+        largest = max(int(trials.presented.max(initial=0)), int(trials.recalled.max(initial=0)))
+        if self.ids is not None and largest > len(self.ids):
+            raise ValueError("word ids not known to this store; encode the trials with store.encode()")
+
+        # Conditions are stored as indices into the header's list, which grows as needed
+        conditions = self.header['conditions']
+        for name in trials.conditions:
+            if name not in conditions:
+                conditions.append(str(name))
+        lookup = np.array([conditions.index(name) for name in trials.conditions], dtype=np.int64)
+
+        width = self.header['recall_width']
+        recalled = np.zeros((n, width), dtype=self.header['dtypes']['recalled'])
+        cut = min(width, trials.recalled.shape[1])
+        recalled[:, :cut] = trials.recalled[:, :cut]
+
+        columns = {
+            'presented': trials.presented,
+            'recalled': recalled,
+            'p_len': trials.p_len,
+            'r_len': np.minimum(trials.r_len, width),
+            'cond': lookup[trials.cond],
+            'trial': trials.trial,
+            'timestamp': np.full(n, time.time()) if timestamps is None else timestamps,
+        }
+
+        n_before = len(self)
+        for name, values in columns.items():
+            dtype = np.dtype(self.header['dtypes'][name])
+            row_bytes = dtype.itemsize * (self.width(name) or 1)
+            with open(os.path.join(self.path, name + '.bin'), 'r+b') as f:
+                f.truncate(n_before * row_bytes)  # drop rows of an interrupted append
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+        if self.ids is not None:
+            self.header['words'] = sorted(self.ids, key=self.ids.get)
+        self.header['n_trials'] = n_before + n
+        save_header(self.path, self.header)
+        self.maps.clear()
+        return n
+
+
+# --- Parallel reading ---
+worker_stores = {}
+
+
+def run_chunk(path, func, start, stop):
+    """Worker side of map_chunks: open the store once per process and run func on one slice"""
+    if path not in worker_stores:
+        worker_stores[path] = TrialStore(path)
+    return func(worker_stores[path][start:stop])
+
+
+def map_chunks(path, func, chunk_size=CHUNK_SIZE, processes=None):
+    """[func(store[a:b]) for every chunk], run in worker processes that each map the store.
+
+    func must be a module-level function (it is pickled to the workers) and gets an
+    EncodedTrials; combine the per-chunk results yourself (e.g. sum counts).
+    """
+    n = len(TrialStore(path))
+    starts = range(0, n, chunk_size)
+    if processes == 1:
+        return [run_chunk(path, func, start, start + chunk_size) for start in starts]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_chunk, path, func, start, start + chunk_size) for start in starts]
+        return [future.result() for future in futures]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    store = TrialStore(sys.argv[1])
+    header = dict(store.header)
+    if header.get('words'):
+        header['words'] = f"{len(header['words'])} words"
+    print(json.dumps(header, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
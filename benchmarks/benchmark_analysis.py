@@ -0,0 +1,178 @@
+"""Benchmark the analysis functions on synthetic datasets of 10^3 to 10^7 trials.
+
+Usage (from the project root):
+    python benchmarks/benchmark_analysis.py                     # 10^3 and 10^4 trials
+    python benchmarks/benchmark_analysis.py --max-exp 7         # up to 10^7 trials (slow, needs lots of RAM)
+    python benchmarks/benchmark_analysis.py --save-baseline     # store the results as the new baseline
+    python benchmarks/benchmark_analysis.py --only serial_position_analysis
+
+Each benchmark reports wall time and peak traced memory. When benchmarks/baseline.json
+exists, any result slower or larger than the baseline by more than --tolerance fails the
+run (exit code 1), so numbers can be compared before and after an optimization.
+
+No baseline is committed, because the timings depend on the machine. The regression check
+is off until you run --save-baseline once on the machine you compare on; without a baseline
+the run says so and exits 0.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+this_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(this_dir)
+sys.path.insert(0, os.path.join(project_root, 'analysis'))
+
+from recall_analysis import (clean_word_list, calculate_free_recall_metrics, metrics_dataframe,
+                             serial_position_analysis, letter_confusion_matrix, ci_by_condition,
+                             kruskal_by_condition, pairwise_mannwhitney)
+from effect_sizes import effect_sizes
+from normality import normality_battery
+from rank_tests import compare_conditions
+from recall_dynamics import recall_dynamics
+from serial_scoring import score_serial_recall, transposition_matrices
+from synthetic_data import simulate_free_recall, simulate_serial_recall, to_dataframe
+from trial_encoding import encode_trials
+
+BASELINE_PATH = os.path.join(this_dir, 'baseline.json')
+
+
+# --- Synthetic datasets ---
+def to_raw_strings(words_lists):
+    """Format lists the way the experiment scripts write them to CSV: [a, b, c]"""
+    return ["[" + ", ".join(words) + "]" for words in words_lists]
+
+
+class Datasets:
+    """Build each synthetic dataset once per size and reuse it across benchmarks"""
+
+    def __init__(self, n):
+        self.n = n
+        self.cache = {}
+
+    def get(self, name):
+        if name not in self.cache:
+            self.cache[name] = getattr(self, 'make_' + name)()
+        return self.cache[name]
+
+    def make_free(self):
+        return to_dataframe(simulate_free_recall(self.n))
+
+    def make_serial(self):
+        return to_dataframe(simulate_serial_recall(self.n, seed=1))
+
+    def make_free_raw(self):
+        return to_raw_strings(self.get('free')['recalled_words'])
+
+    def make_free_results(self):
+        return metrics_dataframe(self.get('free'), calculate_free_recall_metrics)
+
+
+# --- Benchmarks: name -> (dataset, function run on it) ---
+BENCHMARKS = {
+    'clean_word_list': ('free_raw', lambda raw: [clean_word_list(v) for v in raw]),
+    'encode_trials': ('free', lambda df: encode_trials(df, 15)),
+    'calculate_metrics': ('free', lambda df: metrics_dataframe(df, calculate_free_recall_metrics)),
+    'serial_position_analysis': ('free', lambda df: serial_position_analysis(df, list_length=15)),
+    'recall_dynamics': ('free', recall_dynamics),
+    'letter_confusion_matrix': ('serial', letter_confusion_matrix),
+    'serial_scoring': ('serial', score_serial_recall),
+    'transposition_matrices': ('serial', transposition_matrices),
+    'compute_ci': ('free_results', lambda df: {m: ci_by_condition(df, m) for m in ('accuracy', 'primacy', 'recency')}),
+    'kruskal': ('free_results', lambda df: kruskal_by_condition(df, 'accuracy')),
+    'mannwhitney_pairwise': ('free_results', lambda df: pairwise_mannwhitney(df, 'accuracy')),
+    'compare_conditions': ('free_results', compare_conditions),
+    'effect_sizes': ('free_results', effect_sizes),
+    'normality_battery': ('free_results', lambda df: normality_battery({'free_recall': df}, cache_file=None)),
+}
+
+
+def run_benchmark(func, data, repeat=3, measure_memory=True):
+    """Return (best seconds of repeat runs, peak_mb); memory is traced in a separate run so it doesn't skew timing"""
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    peak_mb = None
+    if measure_memory:
+        tracemalloc.start()
+        func(data)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return seconds, peak_mb
+
+
+def compare_to_baseline(results, baseline, tolerance, min_seconds=0.01):
+    """List of human-readable regressions against the stored baseline (timings below min_seconds are noise)"""
+    regressions = []
+    for name, sizes in results.items():
+        for size, result in sizes.items():
+            base = baseline.get(name, {}).get(size)
+            if not base:
+                continue
+            slower = result['seconds'] > base['seconds'] * (1 + tolerance)
+            if slower and result['seconds'] > min_seconds:
+                regressions.append(f"{name} @ {size}: {result['seconds']:.3f}s vs baseline {base['seconds']:.3f}s")
+            if result.get('peak_mb') and base.get('peak_mb') and result['peak_mb'] > base['peak_mb'] * (1 + tolerance):
+                regressions.append(f"{name} @ {size}: {result['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-exp', type=int, default=3, help='smallest dataset is 10^min_exp trials')
+    parser.add_argument('--max-exp', type=int, default=4, help='largest dataset is 10^max_exp trials')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='run only these benchmarks')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (best is kept)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced peak-memory run')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs baseline (0.25 = 25%%)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='write these results as the new baseline')
+    args = parser.parse_args()
+
+    names = args.only or list(BENCHMARKS)
+    results = {name: {} for name in names}
+
+    print(f"{'benchmark':<26} {'trials':>10} {'seconds':>10} {'peak MB':>10}")
+    for exp in range(args.min_exp, args.max_exp + 1):
+        n = 10 ** exp
+        datasets = Datasets(n)
+        for name in names:
+            dataset, func = BENCHMARKS[name]
+            seconds, peak_mb = run_benchmark(func, datasets.get(dataset), args.repeat, not args.no_memory)
+            results[name][str(n)] = {'seconds': seconds, 'peak_mb': peak_mb}
+            peak = f"{peak_mb:10.1f}" if peak_mb is not None else f"{'-':>10}"
+            print(f"{name:<26} {n:>10} {seconds:10.3f} {peak}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        for name, sizes in results.items():
+            baseline.setdefault(name, {}).update(sizes)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nNo regressions against baseline.")
+    else:
+        print(f"\nNo baseline at {args.baseline}: regression check skipped (run with --save-baseline to create one).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
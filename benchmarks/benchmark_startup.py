@@ -0,0 +1,88 @@
+"""Measure time-to-first-frame of the experiment scripts' pygame startup.
+
+Usage (from the project root):
+    python benchmarks/benchmark_startup.py               # pygame.init() vs init_pygame(), 10 runs each
+    python benchmarks/benchmark_startup.py --runs 30 --audio
+
+Every run is a fresh Python process that imports pygame, initialises it, opens the
+1280x720 window and shows a first frame with text, like the start screen does. The
+clock starts before `import pygame`, so import, init, set_mode and the first flip
+are all included. Set SDL_VIDEODRIVER=dummy to run without a screen.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+this_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(this_dir)
+
+MODES = ('pygame.init', 'init_pygame')
+STEPS = ('import', 'init', 'set_mode', 'first_frame')
+
+
+def first_frame(mode, audio):
+    """Run the startup sequence once in this process -> {step: seconds since start}"""
+    start = time.perf_counter()
+    marks = {}
+
+    import pygame
+    marks['import'] = time.perf_counter() - start
+
+    if mode == 'pygame.init':
+        pygame.init()
+    else:
+        sys.path.insert(0, project_root)
+        from experiment_runtime.startup import init_pygame
+        init_pygame(audio=audio)
+    marks['init'] = time.perf_counter() - start
+
+    pygame.display.set_caption('Startup benchmark')
+    screen = pygame.display.set_mode((1280, 720))
+    marks['set_mode'] = time.perf_counter() - start
+
+    font = pygame.font.Font(None, 74)
+    screen.fill((255, 255, 255))
+    text = font.render('Press SPACE to start', True, (0, 0, 0))
+    screen.blit(text, text.get_rect(center=(640, 360)))
+    pygame.display.flip()
+    marks['first_frame'] = time.perf_counter() - start
+
+    pygame.quit()
+    return marks
+
+
+def run_child(mode, audio):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', mode]
+    if audio:
+        cmd.append('--audio')
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    out = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='fresh processes per mode')
+    parser.add_argument('--audio', action='store_true', help='also initialise the mixer in init_pygame mode')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(first_frame(args.child, args.audio)))
+        return 0
+
+    print(f"{'mode':<14}" + "".join(f"{step + ' ms':>16}" for step in STEPS))
+    for mode in MODES:
+        runs = [run_child(mode, args.audio) for _ in range(args.runs)]
+        medians = [statistics.median(run[step] for run in runs) * 1000 for step in STEPS]
+        print(f"{mode:<14}" + "".join(f"{ms:16.1f}" for ms in medians))
+    print(f"\nMedian of {args.runs} runs, cumulative since process start.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
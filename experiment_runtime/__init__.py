@@ -0,0 +1 @@
+"""Shared runtime helpers for the Free Recall and Serial Recall experiment scripts."""
@@ -0,0 +1,129 @@
+import csv
+import os
+import time
+
+import pygame
+
+# Turn on with RECALL_FRAME_TIMING=1 (off by default so normal sessions are untouched)
+ENABLED = os.environ.get('RECALL_FRAME_TIMING', '0') == '1'
+
+REFRESH_RATE = 60  # Hz, frame budget used when a phase doesn't give its own
+
+# Histogram bin upper edges in ms (last bin catches everything above)
+BIN_EDGES_MS = [0.5, 1, 2, 4, 8, 16.7, 33.3, 50, 100, float('inf')]
+
+
+class PhaseStats:
+    """Running histogram of render and flip durations for one phase"""
+
+    def __init__(self, frame_ms):
+        self.frame_ms = frame_ms
+        self.frames = 0
+        self.missed = 0
+        self.render_sum = 0.0
+        self.flip_sum = 0.0
+        self.render_max = 0.0
+        self.flip_max = 0.0
+        self.render_bins = [0] * len(BIN_EDGES_MS)
+        self.flip_bins = [0] * len(BIN_EDGES_MS)
+
+    def add(self, render_ms, flip_ms):
+        self.frames += 1
+        self.render_sum += render_ms
+        self.flip_sum += flip_ms
+        self.render_max = max(self.render_max, render_ms)
+        self.flip_max = max(self.flip_max, flip_ms)
+        self.render_bins[bin_index(render_ms)] += 1
+        self.flip_bins[bin_index(flip_ms)] += 1
+        if render_ms + flip_ms > self.frame_ms:
+            self.missed += 1
+
+
+def bin_index(ms):
+    for i, edge in enumerate(BIN_EDGES_MS):
+        if ms <= edge:
+            return i
+    return len(BIN_EDGES_MS) - 1
+
+
+class FrameTimer:
+    """Per-phase render/flip timing. Call begin_frame() before drawing and flip() instead of display.flip()"""
+
+    def __init__(self, refresh_rate=REFRESH_RATE, display=pygame.display):
+        self.refresh_ms = 1000 / refresh_rate
+        self.display = display
+        self.stats = {}
+        self.current = None
+        self.frame_start = None
+        self.session_start = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def phase(self, name, frame_ms=None):
+        """Switch to a phase; frame_ms is its frame budget (e.g. 1000/30 for clock.tick(30))"""
+        if name not in self.stats:
+            self.stats[name] = PhaseStats(frame_ms or self.refresh_ms)
+        self.current = self.stats[name]
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+
+    def flip(self):
+        self.present(self.display.flip)
+
+    def update(self, rects):
+        """Like flip(), but only copies the given screen regions (pygame.display.update)"""
+        self.present(self.display.update, rects)
+
+    def present(self, show, *args):
+        before_flip = time.perf_counter()
+        show(*args)
+        after_flip = time.perf_counter()
+        if self.current is not None and self.frame_start is not None:
+            self.current.add((before_flip - self.frame_start) * 1000, (after_flip - before_flip) * 1000)
+        self.frame_start = None
+
+    def summary_rows(self, condition):
+        rows = []
+        for name, s in self.stats.items():
+            if not s.frames:
+                continue
+            for metric, total, peak, bins in (('render', s.render_sum, s.render_max, s.render_bins),
+                                              ('flip', s.flip_sum, s.flip_max, s.flip_bins)):
+                rows.append([self.session_start, condition, name, metric, s.frames, s.missed,
+                             round(total / s.frames, 3), round(peak, 3)] + bins)
+        return rows
+
+    def save_summary(self, csv_file, condition):
+        """Append one histogram row per phase and metric for this session"""
+        file_has_content = os.path.exists(csv_file) and os.path.getsize(csv_file) > 0
+
+        with open(csv_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+
+            if not file_has_content:
+                bin_labels = [f'le_{edge}ms' for edge in BIN_EDGES_MS[:-1]] + [f'gt_{BIN_EDGES_MS[-2]}ms']
+                writer.writerow(['session', 'condition', 'phase', 'metric', 'frames', 'missed_frames',
+                                 'mean_ms', 'max_ms'] + bin_labels)
+
+            writer.writerows(self.summary_rows(condition))
+
+
+class NullFrameTimer:
+    """Stand-in used when instrumentation is off: flip/update are the display's own functions"""
+
+    def __init__(self, display=pygame.display):
+        self.flip = display.flip
+        self.update = display.update
+
+    def phase(self, name, frame_ms=None):
+        pass
+
+    def begin_frame(self):
+        pass
+
+    def save_summary(self, csv_file, condition):
+        pass
+
+
+def make_frame_timer(enabled=ENABLED, display=pygame.display):
+    """display presents the frames: pygame.display, or a TextureScreen (see renderer.display_for)"""
+    return FrameTimer(display=display) if enabled else NullFrameTimer(display)
@@ -0,0 +1,201 @@
+"""Append-only trial journal, so a crash or a killed window does not lose the trial.
+
+Every experiment process appends JSON lines to its own journal,
+Experiment_Output/journal/<station>_<pid>_<ns>.jsonl (RECALL_JOURNAL_DIR moves it, e.g. to a
+local disk), as each phase of a trial completes:
+
+    begin       experiment, condition, station and time
+    stimuli     the presented items
+    responses   the recalled items
+    rows        each CSV append of the trial (shard row, keystroke timings, ...), which is
+                then handed on to the ResultWriter
+    committed   the writer reported everything on disk
+
+Lines are flushed to the OS as they are written; a background thread fsyncs them, right
+away by default or every SESSION_COMMIT_INTERVAL seconds with RECALL_SESSION=1, so records
+that arrive together share one fsync (group commit). A journal whose trials are all committed
+is deleted when it is closed.
+
+recover() replays trials of the journals left behind: their journaled rows are appended to
+files that do not have the trial yet, or, when the process died before saving, a shard row
+is built from the stimuli and responses. It runs before compaction in
+`python -m experiment_runtime.shards`, or on its own with `python -m experiment_runtime.journal`.
+Run either between sessions, not while experiments are writing.
+"""
+import csv
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+from experiment_runtime.shards import STATION, append_trial, new_trial_uid, shard_path
+from experiment_runtime.writer import append_rows
+
+SESSION_MODE = os.environ.get('RECALL_SESSION', '') not in ('', '0')
+SESSION_COMMIT_INTERVAL = 0.5  # seconds between fsyncs in session mode
+
+
+def journal_dir(data_dir):
+    return os.environ.get('RECALL_JOURNAL_DIR') or os.path.join(data_dir, 'journal')
+
+
+def list_str(items):
+    """Items in the bracketed format the scripts save: [a, b, c]"""
+    return "[" + ", ".join(items) + "]"
+
+
+class TrialJournal:
+    """Journal of this process's trials; append_rows() makes it usable as the scripts' writer"""
+
+    def __init__(self, data_dir, experiment, writer=None, commit_interval=None, station=STATION):
+        self.data_dir = data_dir
+        self.experiment = experiment
+        self.writer = writer
+        self.station = station
+        self.commit_interval = commit_interval if commit_interval is not None else (
+            SESSION_COMMIT_INTERVAL if SESSION_MODE else 0)
+        self.trial_uid = None
+        self.open_trials = set()
+
+        directory = journal_dir(data_dir)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{station}_{os.getpid()}_{time.time_ns()}.jsonl")
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+        self.closed = False
+        self.dirty = threading.Event()
+        self.thread = threading.Thread(target=self.sync_loop, name='journal-sync', daemon=True)
+        self.thread.start()
+
+    def record(self, event, **data):
+        """Append one record for the current trial"""
+        line = json.dumps({'uid': self.trial_uid, 'event': event, **data}, ensure_ascii=False)
+        self.file.write(line + '\n')
+        self.file.flush()
+        self.dirty.set()
+
+    def begin(self, condition):
+        """Start a new trial -> its trial_uid (pass it on to append_trial)"""
+        self.trial_uid = new_trial_uid(self.station)
+        self.open_trials.add(self.trial_uid)
+        self.record('begin', experiment=self.experiment, condition=condition, station=self.station,
+                    time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        return self.trial_uid
+
+    def append_rows(self, csv_file, header, rows):
+        """Journal a CSV append, then pass it to the ResultWriter (or write it directly)"""
+        rows = [list(row) for row in rows]
+        self.record('rows', file=os.path.relpath(csv_file, self.data_dir), header=list(header), rows=rows)
+        if self.writer:
+            self.writer.append_rows(csv_file, header, rows)
+        else:
+            append_rows(csv_file, header, rows)
+
+    def commit(self):
+        """The current trial's rows are saved; recovery can skip it"""
+        self.record('committed')
+        self.open_trials.discard(self.trial_uid)
+
+    def sync_loop(self):
+        while not self.closed:
+            self.dirty.wait()
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+            self.dirty.clear()
+            try:
+                os.fsync(self.file.fileno())
+            except (OSError, ValueError):
+                pass  # closed meanwhile; close() syncs one last time
+
+    def close(self):
+        """Sync and close; the journal is deleted if all its trials were committed"""
+        if self.closed:
+            return
+        self.closed = True
+        self.dirty.set()
+        self.thread.join()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if not self.open_trials:
+            os.remove(self.path)
+
+
+# --- Recovery ---
+def read_journal(path):
+    """Records of a journal file; a torn last line (crash while writing) is ignored"""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+def trial_ids_in(csv_file):
+    """Values of the first column (trial ids) already in csv_file"""
+    if not os.path.exists(csv_file):
+        return set()
+    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+        return {row[0] for row in csv.reader(f) if row}
+
+
+def replay_trial(data_dir, uid, records):
+    """Save one uncommitted trial -> True if it was recovered, False if it never got responses"""
+    rows_records = [r for r in records if r['event'] == 'rows']
+    if rows_records:
+        for r in rows_records:
+            csv_file = os.path.join(data_dir, r['file'])
+            if uid not in trial_ids_in(csv_file):
+                os.makedirs(os.path.dirname(csv_file), exist_ok=True)
+                append_rows(csv_file, r['header'], r['rows'])
+        return True
+
+    begin = next((r for r in records if r['event'] == 'begin'), None)
+    stimuli = next((r for r in records if r['event'] == 'stimuli'), None)
+    responses = [r for r in records if r['event'] == 'responses']
+    if not (begin and stimuli and responses):
+        return False
+    if uid in trial_ids_in(shard_path(data_dir, begin['experiment'], begin['station'], begin['time'][:10])):
+        return True
+    append_trial(data_dir, begin['experiment'], begin['condition'], list_str(stimuli['presented']),
+                 list_str(responses[-1]['recalled']), station=begin['station'], trial_uid=uid,
+                 timestamp=begin['time'])
+    return True
+
+
+def recover(data_dir):
+    """Replay the uncommitted trials of all journals, then delete them -> (recovered, abandoned) counts.
+
+    Replaying checks the trial ids already saved, so an interrupted recovery can simply be run again.
+    """
+    recovered = abandoned = 0
+    for path in sorted(glob.glob(os.path.join(journal_dir(data_dir), '*.jsonl'))):
+        trials = {}
+        for record in read_journal(path):
+            trials.setdefault(record.get('uid'), []).append(record)
+        for uid, records in trials.items():
+            if uid is None or any(r['event'] == 'committed' for r in records):
+                continue
+            if replay_trial(data_dir, uid, records):
+                recovered += 1
+            else:
+                abandoned += 1  # stopped before recall ended: nothing to save
+        os.remove(path)
+    return recovered, abandoned
+
+
+def main():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(project_root, 'Experiment_Output')
+    recovered, abandoned = recover(data_dir)
+    print(f"{recovered} trials recovered from journals, {abandoned} unfinished trials skipped")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
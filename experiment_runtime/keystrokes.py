@@ -0,0 +1,83 @@
+import pygame
+
+from experiment_runtime.writer import append_rows
+
+KEYSTROKE_HEADER = ['trial', 'condition', 'keystroke', 'key', 'char', 'time_ms', 'interval_ms', 'resolution_ms']
+SDL_RESOLUTION_MS = 1  # SDL's millisecond tick clock
+
+
+class KeystrokeRecorder:
+    """Record every KEYDOWN during recall into a preallocated ring buffer.
+
+    pygame 2.6 does not put SDL's timestamp on KEYDOWN events, so the time a key was pressed
+    is the time the event loop takes it off the queue. wait_events() blocks until an event
+    arrives instead of sleeping a whole frame, so that time is read on SDL's millisecond clock
+    as soon as the key arrives: about 1 ms resolution. Keys that arrive within the same wakeup
+    (a few ms) share a time. Events taken with pygame.event.get() in a loop that ticks at
+    frame_ms are only stamped to within that frame (~33 ms at 30 fps). Each saved keystroke
+    carries the resolution of its time in resolution_ms. An SDL event timestamp is used
+    whenever pygame provides one.
+
+    The buffer is written to CSV in one go with save() once the trial is finished.
+    """
+
+    def __init__(self, capacity=1024, frame_ms=1000 / 30):
+        self.capacity = capacity
+        self.frame_ms = frame_ms
+        self.times = [0] * capacity
+        self.keys = [0] * capacity
+        self.chars = [''] * capacity
+        self.resolutions = [0] * capacity
+        self.count = 0
+        self.start_time = 0
+        self.arrival_time = None
+
+    def start(self):
+        """Mark recall onset; keystroke times are also stored relative to this"""
+        self.start_time = pygame.time.get_ticks()
+        self.count = 0
+
+    def wait_events(self, timeout_ms):
+        """Wait up to timeout_ms for the next event -> all queued events, stamped with their arrival time"""
+        first = pygame.event.wait(int(timeout_ms))
+        self.arrival_time = pygame.time.get_ticks()
+        events = [] if first.type == pygame.NOEVENT else [first]
+        return events + pygame.event.get()
+
+    def record(self, event):
+        """Store one KEYDOWN event with the best time available and its resolution"""
+        timestamp = getattr(event, 'timestamp', None)
+        resolution = SDL_RESOLUTION_MS
+        if timestamp is None and self.arrival_time is not None:
+            timestamp = self.arrival_time  # taken by wait_events() as the event arrived
+        elif timestamp is None:
+            timestamp = pygame.time.get_ticks()  # dequeued by a frame-paced loop
+            resolution = round(self.frame_ms)
+        i = self.count % self.capacity
+        self.times[i] = timestamp
+        self.keys[i] = event.key
+        self.chars[i] = event.unicode
+        self.resolutions[i] = resolution
+        self.count += 1
+
+    def events(self):
+        """Recorded (time_ms, key, char, resolution_ms) tuples in the order they were typed (oldest dropped on overflow)"""
+        n = min(self.count, self.capacity)
+        first = self.count - n
+        return [(self.times[j % self.capacity], self.keys[j % self.capacity], self.chars[j % self.capacity],
+                 self.resolutions[j % self.capacity]) for j in range(first, self.count)]
+
+    def rows(self, trial_id, condition):
+        """CSV rows with the time since recall onset and the inter-keystroke interval"""
+        rows = []
+        previous = self.start_time
+        for index, (time_ms, key, char, resolution) in enumerate(self.events(), start=1):
+            rows.append([trial_id, condition, index, pygame.key.name(key), char,
+                         time_ms - self.start_time, time_ms - previous, resolution])
+            previous = time_ms
+        return rows
+
+    def save(self, csv_file, trial_id, condition, writer=None):
+        """Append all keystrokes of this trial to csv_file (queued if a ResultWriter is given)"""
+        write_rows = writer.append_rows if writer else append_rows
+        write_rows(csv_file, KEYSTROKE_HEADER, self.rows(trial_id, condition))
@@ -0,0 +1,99 @@
+import cProfile
+import csv
+import os
+import time
+
+# RECALL_PROFILE=1 times every phase, RECALL_PROFILE=cprofile also writes a cProfile dump per phase
+PROFILE_MODE = os.environ.get('RECALL_PROFILE', '0').lower()
+
+
+def process_uptime():
+    """Wall-clock seconds since this process started (Linux /proc), CPU time as a fallback elsewhere"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.process_time()
+
+
+class PhaseProfiler:
+    """Wall-clock timer for consecutive experiment phases; phase() ends the previous one"""
+
+    def __init__(self, use_cprofile=False):
+        self.use_cprofile = use_cprofile
+        self.session = time.strftime('%Y%m%d_%H%M%S')
+        self.timings = [('startup', process_uptime())]  # interpreter start + imports until now
+        self.profiles = {}
+        self.current = None
+        self.current_start = None
+        self.current_profile = None
+
+    def phase(self, name):
+        self.stop()
+        self.current = name
+        if self.use_cprofile:
+            self.current_profile = self.profiles.setdefault(name, cProfile.Profile())
+            self.current_profile.enable()
+        self.current_start = time.perf_counter()
+
+    def stop(self):
+        if self.current is None:
+            return
+        elapsed = time.perf_counter() - self.current_start
+        if self.current_profile is not None:
+            self.current_profile.disable()
+            self.current_profile = None
+        self.timings.append((self.current, elapsed))
+        self.current = None
+
+    def report(self):
+        total = sum(seconds for _, seconds in self.timings)
+        lines = ['Phase timing report:']
+        for name, seconds in self.timings:
+            share = seconds / total * 100 if total else 0
+            lines.append(f'  {name:<18} {seconds * 1000:10.1f} ms  ({share:5.1f}%)')
+        lines.append(f'  {"total":<18} {total * 1000:10.1f} ms')
+        return '\n'.join(lines)
+
+    def finish(self, csv_file, condition):
+        """End the last phase, print the report and append it to csv_file (cProfile dumps go next to it)"""
+        self.stop()
+        print(self.report())
+
+        file_has_content = os.path.exists(csv_file) and os.path.getsize(csv_file) > 0
+        with open(csv_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if not file_has_content:
+                writer.writerow(['session', 'condition', 'phase', 'seconds'])
+            writer.writerows([self.session, condition, name, round(seconds, 6)] for name, seconds in self.timings)
+
+        if self.profiles:
+            profile_dir = os.path.join(os.path.dirname(csv_file), 'profiles')
+            os.makedirs(profile_dir, exist_ok=True)
+            for name, profile in self.profiles.items():
+                profile.dump_stats(os.path.join(profile_dir, f'{self.session}_{condition}_{name}.prof'))
+            print(f"cProfile dumps saved to {profile_dir}")
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off"""
+
+    def phase(self, name):
+        pass
+
+    def stop(self):
+        pass
+
+    def finish(self, csv_file, condition):
+        pass
+
+
+def make_profiler(mode=PROFILE_MODE):
+    if mode in ('1', 'true', 'on'):
+        return PhaseProfiler()
+    if mode == 'cprofile':
+        return PhaseProfiler(use_cprofile=True)
+    return NullProfiler()
@@ -0,0 +1,123 @@
+"""Optional texture renderer for the experiment window (RECALL_RENDERER=texture).
+
+By default the scripts draw into the window surface with software blits and present it with
+pygame.display.flip(). With RECALL_RENDERER=texture the window is driven by pygame._sdl2's
+Renderer instead: every surface the scripts blit (the stimulus atlas, text lines, the lines of
+the static screens) is uploaded once as a Texture, and each frame is composed from those
+textures by the GPU and presented in step with the display refresh.
+
+TextureScreen takes the calls the scripts make on the window surface (fill, blit, get_rect),
+so the drawing code is the same for both backends. The renderer does not keep its back buffer
+between frames, so TextureScreen remembers what is on screen as layers: an opaque blit or a
+fill drops the layers it covers, and flip() / update() redraw all layers and present.
+A surface must not be changed after it was blitted (its texture is reused).
+
+If pygame._sdl2 or an accelerated renderer is not available (headless machines, the dummy
+video driver, old SDL), make_screen() falls back to the software window surface.
+"""
+import os
+import weakref
+
+import pygame
+
+# Turn on with RECALL_RENDERER=texture (software rendering is the default)
+RENDERER = os.environ.get('RECALL_RENDERER', 'software')
+VSYNC = True  # present() waits for the refresh, so onsets line up with the display
+
+
+class TextureScreen:
+    """Window drawn through an SDL2 Renderer; stands in for the display surface"""
+
+    def __init__(self, size, caption=None, vsync=VSYNC):
+        from pygame._sdl2 import Renderer, Window
+
+        self.window = Window(caption or pygame.display.get_caption()[0], size)
+        try:
+            self.renderer = Renderer(self.window, accelerated=1, vsync=vsync)
+        except RuntimeError:
+            self.window.destroy()
+            raise
+        self.rect = pygame.Rect((0, 0), size)
+        self.background = pygame.Color(0, 0, 0)
+        self.layers = []  # (rect, texture, area, fill colour) in drawing order
+        self.textures = weakref.WeakKeyDictionary()
+
+    def get_rect(self, **kwargs):
+        rect = self.rect.copy()
+        for name, value in kwargs.items():
+            setattr(rect, name, value)
+        return rect
+
+    def get_size(self):
+        return self.rect.size
+
+    def get_width(self):
+        return self.rect.width
+
+    def get_height(self):
+        return self.rect.height
+
+    def texture(self, surface):
+        """The texture of a surface, uploaded on its first blit"""
+        if surface not in self.textures:
+            from pygame._sdl2 import Texture
+            self.textures[surface] = Texture.from_surface(self.renderer, surface)
+        return self.textures[surface]
+
+    def cover(self, rect):
+        """Drop the layers an opaque draw into rect hides"""
+        self.layers = [layer for layer in self.layers if not rect.contains(layer[0])]
+
+    def fill(self, color, rect=None):
+        color = pygame.Color(color)
+        if rect is None:
+            self.background = color
+            self.layers = []
+            return self.rect.copy()
+        rect = pygame.Rect(rect).clip(self.rect)
+        self.cover(rect)
+        self.layers.append((rect, None, None, color))
+        return rect
+
+    def blit(self, source, dest, area=None):
+        area = source.get_rect() if area is None else pygame.Rect(area).clip(source.get_rect())
+        rect = pygame.Rect((dest[0], dest[1]), area.size)
+        if not area.width or not area.height:
+            return rect.clip(self.rect)  # e.g. an empty line of text: nothing to draw
+        opaque = not source.get_flags() & pygame.SRCALPHA and source.get_colorkey() is None
+        if opaque:
+            self.cover(rect)
+        self.layers.append((rect, self.texture(source), area, None))
+        return rect.clip(self.rect)
+
+    def flip(self):
+        """Compose all layers and present"""
+        renderer = self.renderer
+        renderer.draw_color = self.background
+        renderer.clear()
+        for rect, texture, area, color in self.layers:
+            if texture is None:
+                renderer.draw_color = color
+                renderer.fill_rect(rect)
+            else:
+                texture.draw(srcrect=area, dstrect=rect)
+        renderer.present()
+
+    def update(self, rects=None):
+        """The whole frame is composed anyway; same as flip()"""
+        self.flip()
+
+
+def make_screen(size, backend=RENDERER):
+    """The window to draw on: a TextureScreen for RECALL_RENDERER=texture, else the display surface"""
+    if backend == 'texture':
+        try:
+            return TextureScreen(size)
+        except (ImportError, RuntimeError) as e:
+            print(f"Texture renderer unavailable, using software rendering: {e}")
+    return pygame.display.set_mode(size)
+
+
+def display_for(screen):
+    """What presents the screen: the TextureScreen itself, or pygame.display for a window surface"""
+    return screen if isinstance(screen, TextureScreen) else pygame.display
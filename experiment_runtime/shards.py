@@ -0,0 +1,165 @@
+"""Per-station result shards and the off-line compaction into the canonical results files.
+
+During a session every experiment process appends its trial to its own shard,
+Experiment_Output/shards/<experiment>/<station>_<date>.csv, so saving never has to read
+or lock the shared results file. Between sessions
+
+    python -m experiment_runtime.shards
+
+merges all shards into Experiment_Output/<experiment>_results.csv: new trials (by their
+globally unique trial_uid) are sorted by time, numbered after the highest existing trial
+and appended; trials merged before are skipped, so running it twice changes nothing.
+The uid -> trial mapping is kept in shards/<experiment>/trial_ids.csv, which keystroke,
+chunk-origin etc. files (keyed by trial_uid) can be joined through.
+"""
+import csv
+import os
+import re
+import socket
+import sys
+import time
+
+from experiment_runtime.writer import append_rows
+
+EXPERIMENTS = ('free_recall', 'serial_recall')
+SHARD_HEADER = ['trial_uid', 'timestamp', 'station', 'condition', 'presented_words', 'recalled_words']
+CANONICAL_HEADER = ['trial', 'condition', 'presented_words', 'recalled_words']
+ID_MAP_HEADER = ['trial_uid', 'trial']
+
+# Station name: RECALL_STATION if set, otherwise the computer's host name
+STATION = re.sub(r'[^A-Za-z0-9_-]', '-', os.environ.get('RECALL_STATION') or socket.gethostname() or 'station')
+
+
+def shard_dir(data_dir, experiment):
+    return os.path.join(data_dir, 'shards', experiment)
+
+
+def new_trial_uid(station=STATION):
+    """Unique across stations and processes: station, wall-clock time in ns and process id"""
+    return f"{station}-{time.time_ns()}-{os.getpid()}"
+
+
+def shard_path(data_dir, experiment, station=STATION, date=None):
+    """Shard of a station for one day (default today), date as YYYY-MM-DD"""
+    return os.path.join(shard_dir(data_dir, experiment), f"{station}_{date or time.strftime('%Y-%m-%d')}.csv")
+
+
+def append_trial(data_dir, experiment, condition, presented_str, recalled_str, station=STATION, writer=None,
+                 trial_uid=None, timestamp=None):
+    """Append one trial to this station's shard for today -> (trial_uid, shard_file).
+
+    With a ResultWriter (or TrialJournal) the row is only queued and written in the background.
+    trial_uid and timestamp (YYYY-MM-DDTHH:MM:SS) default to a new uid and now.
+    """
+    os.makedirs(shard_dir(data_dir, experiment), exist_ok=True)
+    timestamp = timestamp or time.strftime('%Y-%m-%dT%H:%M:%S')
+    shard_file = shard_path(data_dir, experiment, station, timestamp[:10])
+    trial_uid = trial_uid or new_trial_uid(station)
+    row = [trial_uid, timestamp, station, condition, presented_str, recalled_str]
+
+    write_rows = writer.append_rows if writer else append_rows
+    write_rows(shard_file, SHARD_HEADER, [row])
+    return trial_uid, shard_file
+
+
+# --- Compaction ---
+def read_shards(directory):
+    """All shard rows as dicts, deduplicated by trial_uid (first copy wins)"""
+    rows = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.csv') or name == 'trial_ids.csv':
+            continue
+        with open(os.path.join(directory, name), 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row.get('trial_uid') and row['trial_uid'] not in rows:
+                    rows[row['trial_uid']] = row
+    return rows
+
+
+def read_id_map(id_map_file):
+    if not os.path.exists(id_map_file):
+        return {}
+    with open(id_map_file, 'r', newline='', encoding='utf-8') as f:
+        return {row['trial_uid']: row['trial'] for row in csv.DictReader(f)}
+
+
+def last_trial_number(canonical_file):
+    """Highest trial number in the canonical file (0 if empty or missing)"""
+    if not os.path.exists(canonical_file) or os.path.getsize(canonical_file) == 0:
+        return 0
+    with open(canonical_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        numbers = [int(row[0]) for row in reader if row and row[0].strip().isdigit()]
+    return max(numbers, default=0)
+
+
+def ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def compact(data_dir, experiment):
+    """Merge the experiment's shards into its canonical results file -> number of trials added"""
+    directory = shard_dir(data_dir, experiment)
+    if not os.path.isdir(directory):
+        return 0
+    canonical_file = os.path.join(data_dir, f'{experiment}_results.csv')
+    id_map_file = os.path.join(directory, 'trial_ids.csv')
+
+    merged = read_id_map(id_map_file)
+    shard_rows = read_shards(directory)
+    last_trial = last_trial_number(canonical_file)
+
+    # Trials numbered by an interrupted earlier run (in the id map but not yet in the results file)
+    pending = [(int(merged[uid]), row) for uid, row in shard_rows.items()
+               if uid in merged and int(merged[uid]) > last_trial]
+
+    new_rows = sorted((row for uid, row in shard_rows.items() if uid not in merged),
+                      key=lambda row: (row['timestamp'], row['trial_uid']))
+    next_trial = max([last_trial] + [int(trial) for trial in merged.values()]) + 1
+    numbered = [(next_trial + i, row) for i, row in enumerate(new_rows)]
+    if not pending and not numbered:
+        return 0
+
+    # The id map is written first: if we stop before the results are written, the next run finds
+    # these trials pending above and appends them with the same numbers (no duplicates, no losses)
+    map_has_content = os.path.exists(id_map_file) and os.path.getsize(id_map_file) > 0
+    with open(id_map_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if not map_has_content:
+            writer.writerow(ID_MAP_HEADER)
+        writer.writerows([row['trial_uid'], trial] for trial, row in numbered)
+
+    file_has_content = os.path.exists(canonical_file) and os.path.getsize(canonical_file) > 0
+    with open(canonical_file, 'a', newline='', encoding='utf-8') as f:
+        if file_has_content and not ends_with_newline(canonical_file):
+            f.write('\n')  # older files were saved without a final newline
+        writer = csv.writer(f)
+        if not file_has_content:
+            writer.writerow(CANONICAL_HEADER)
+        writer.writerows([trial, row['condition'], row['presented_words'], row['recalled_words']]
+                         for trial, row in sorted(pending + numbered, key=lambda item: item[0]))
+
+    return len(pending) + len(numbered)
+
+
+def main():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(project_root, 'Experiment_Output')
+
+    # Trials of crashed or killed runs are still in their journals; save them to the shards first
+    from experiment_runtime.journal import recover
+    recovered, abandoned = recover(data_dir)
+    if recovered or abandoned:
+        print(f"{recovered} trials recovered from journals, {abandoned} unfinished trials skipped")
+
+    for experiment in EXPERIMENTS:
+        added = compact(data_dir, experiment)
+        print(f"{experiment}: {added} new trials merged into {experiment}_results.csv")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import os
+
+import pygame
+
+# Turn on with RECALL_AUDIO=1 (only needed for auditory stimuli; audio init is slow on some lab machines)
+AUDIO = os.environ.get('RECALL_AUDIO', '0') == '1'
+
+
+def init_pygame(audio=AUDIO):
+    """Initialise only the subsystems the experiments use instead of pygame.init().
+
+    display (which also brings up the event queue), font and the timer; the mixer only
+    when audio is asked for. Joystick, camera etc. are never started.
+    """
+    pygame.display.init()
+    pygame.font.init()
+    pygame.time.wait(0)  # starts SDL's timer so pygame.time.get_ticks() counts from here, as after pygame.init()
+
+    if audio:
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            print(f"Audio unavailable, continuing without sound: {e}")
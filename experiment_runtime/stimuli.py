@@ -0,0 +1,42 @@
+import pygame
+
+
+class StimulusAtlas:
+    """All stimuli of one trial pre-rendered into a single surface before presentation starts.
+
+    Every stimulus sits centred in a cell of the same size (the largest rendered text) on the
+    background colour, plus one blank cell. Blitting a cell to `rect` therefore fully replaces
+    the previous stimulus, so an onset is one blit and a flip with no text rendering in between.
+    """
+
+    def __init__(self, font, stimuli, center, color=(0, 0, 0), background=(255, 255, 255)):
+        surfaces = {}
+        for stimulus in stimuli:
+            if stimulus not in surfaces:
+                surfaces[stimulus] = font.render(stimulus, True, color)
+
+        width = max([s.get_width() for s in surfaces.values()] + [1])
+        height = max([s.get_height() for s in surfaces.values()] + [font.get_height()])
+
+        # One row of cells; the last cell stays blank
+        self.surface = pygame.Surface((width * (len(surfaces) + 1), height))
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()  # match the display format so blits are plain copies
+        self.surface.fill(background)
+
+        self.cells = {}
+        for i, (stimulus, text) in enumerate(surfaces.items()):
+            cell = pygame.Rect(i * width, 0, width, height)
+            self.surface.blit(text, text.get_rect(center=cell.center))
+            self.cells[stimulus] = cell
+        self.blank_cell = pygame.Rect(len(surfaces) * width, 0, width, height)
+
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.rect.center = center
+
+    def show(self, screen, stimulus):
+        """Blit a pre-rendered stimulus; returns the screen rect it covers"""
+        return screen.blit(self.surface, self.rect, self.cells[stimulus])
+
+    def show_blank(self, screen):
+        return screen.blit(self.surface, self.rect, self.blank_cell)
@@ -0,0 +1,37 @@
+class TextLine:
+    """One centred line of text that is only re-rendered when its content changes.
+
+    update() erases the old region, blits the new text and returns the screen rect
+    that changed (or None), so the caller can pass it to pygame.display.update().
+    """
+
+    def __init__(self, font, color, center, text='', background=(255, 255, 255)):
+        self.font = font
+        self.color = color
+        self.center = center
+        self.background = background
+        self.text = None
+        self.surface = None
+        self.rect = None
+        self.set_text(text)
+
+    def set_text(self, text):
+        """Render text if it changed; returns True when a new surface was made"""
+        if text == self.text:
+            return False
+        self.text = text
+        self.surface = self.font.render(text, True, self.color)
+        self.rect = self.surface.get_rect(center=self.center)
+        return True
+
+    def draw(self, screen):
+        screen.blit(self.surface, self.rect)
+
+    def update(self, screen, text):
+        """Redraw this line with new text; returns the dirty rect or None if nothing changed"""
+        old_rect = self.rect
+        if not self.set_text(text):
+            return None
+        screen.fill(self.background, old_rect)
+        self.draw(screen)
+        return old_rect.union(self.rect)
@@ -0,0 +1,96 @@
+"""Background writer for trial results, so saving never blocks the experiment window.
+
+The scripts hand finished rows to a ResultWriter (append_rows returns at once) and carry
+on. A worker thread collects whatever arrived within FLUSH_INTERVAL into one batch, appends
+it file by file (header first when a file is new), then flushes and fsyncs each file once
+per batch. A slow or briefly unavailable Experiment_Output share only delays the thread:
+failed writes are retried, and close() (also run at exit) waits until everything is on disk.
+"""
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+
+FLUSH_INTERVAL = 0.05   # seconds to wait for more rows before writing a batch
+RETRIES = 3
+RETRY_DELAY = 0.5       # seconds, multiplied by the attempt number
+
+
+def append_rows(csv_file, header, rows, sync=False):
+    """Append rows to csv_file, writing header first if the file is empty or missing"""
+    file_has_content = os.path.exists(csv_file) and os.path.getsize(csv_file) > 0
+
+    with open(csv_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+
+        if not file_has_content:
+            writer.writerow(header)
+
+        writer.writerows(rows)
+
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ResultWriter:
+    """Queue of (csv_file, header, rows) appends, written by a background thread"""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.errors = []
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name='result-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def append_rows(self, csv_file, header, rows):
+        """Queue rows for csv_file and return immediately"""
+        if self.closed:
+            raise RuntimeError('ResultWriter is closed')
+        self.queue.put((csv_file, header, [list(row) for row in rows]))
+
+    def run(self):
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.flush_interval
+            # Group commit: take everything that arrives shortly after the first record
+            while batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.perf_counter(), 0)))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                stop = True
+                batch.pop()
+            self.write_batch(batch)
+
+    def write_batch(self, batch):
+        """One append, flush and fsync per file, in the order the files were first queued"""
+        files = {}
+        for csv_file, header, rows in batch:
+            files.setdefault(csv_file, (header, []))[1].extend(rows)
+
+        for csv_file, (header, rows) in files.items():
+            for attempt in range(1, RETRIES + 1):
+                try:
+                    append_rows(csv_file, header, rows, sync=True)
+                    break
+                except OSError as error:
+                    if attempt == RETRIES:
+                        self.errors.append((csv_file, len(rows), error))
+                        print(f"Warning: could not save {len(rows)} rows to {csv_file}: {error}")
+                    else:
+                        time.sleep(RETRY_DELAY * attempt)
+
+    def close(self, timeout=None):
+        """Write everything still queued and stop the thread -> True if all rows were saved"""
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+        self.thread.join(timeout)
+        return not self.errors and not self.thread.is_alive()